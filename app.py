@@ -3,6 +3,7 @@
 import streamlit as st
 import sqlite3
 import hashlib
+import threading
 from pathlib import Path
 
 # --- 데이터베이스 경로 (data/ 폴더 사용) ---
@@ -21,6 +22,17 @@ def hash_password(password):
     """비밀번호를 SHA256 해시로 변환합니다."""
     return hashlib.sha256(str.encode(password)).hexdigest()
 
+def start_data_warmup():
+    """
+    데이터 모듈(utils → pandas, pyarrow) import와 백테스팅 예열을 백그라운드 스레드에서 시작합니다.
+    로그인 페이지는 데이터 모듈을 import하지 않으므로, 로그인 응답이 그 import 시간만큼 늦어지지 않습니다.
+    """
+    threading.Thread(target=_start_backtest_warmup, name="stock-warmup", daemon=True).start()
+
+def _start_backtest_warmup():
+    from utils import start_backtest_warmup
+    start_backtest_warmup()
+
 # --- 페이지 기본 설정 ---
 st.set_page_config(
     page_title="투자성향 진단 앱 - 로그인",
@@ -131,6 +143,8 @@ def auth_page():
                         is_authenticated = True
                 
                 if is_authenticated:
+                    # 사용자가 설문을 진행하는 동안 데이터셋/백테스팅 캐시를 백그라운드에서 미리 준비 (프로세스 전체에서 한 번)
+                    start_data_warmup()
                     st.session_state.logged_in = True
                     st.session_state.username = username
                     # last_activity_timestamp 업데이트 로직 제거 (세션 타임아웃 기능 삭제로 불필요)
@@ -0,0 +1,60 @@
+# benchmarks/bench_batch_scoring.py — 설문 채점: calculate_score/classify_investment_type 반복 vs score_batch/classify_batch
+#
+# 실행: python benchmarks/bench_batch_scoring.py [응답 수]
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from survey import calculate_score, classify_investment_type, questions  # noqa: E402
+from survey_batch import SURVEY_KEYS, answers_to_table, classify_batch, score_batch  # noqa: E402
+
+
+def make_answers(n_rows, missing_rate=0.01, seed=0):
+    """무작위 응답 n_rows개 (설문 페이지와 같은 answers dict 형식, 일부 문항은 미응답)."""
+    rng = np.random.default_rng(seed)
+    columns = {}
+    for key, question in questions.items():
+        n_options = len(question['options'])
+        if key == "investment_experience":
+            selected = rng.random((n_rows, n_options)) < 0.4
+            columns[key] = [np.flatnonzero(row).tolist() for row in selected]
+        else:
+            columns[key] = rng.integers(0, n_options, n_rows).tolist()
+        for row in np.flatnonzero(rng.random(n_rows) < missing_rate):
+            columns[key][row] = None
+    return [{key: columns[key][row] for key in questions} for row in range(n_rows)]
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    answers_list = make_answers(n_rows)
+
+    start = time.perf_counter()
+    scalar = [calculate_score(answers) for answers in answers_list]
+    scalar_types = [classify_investment_type(total)[0] for total, _ in scalar]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = answers_to_table(answers_list)
+    convert_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    totals, breakdown = score_batch(table)
+    types, _ = classify_batch(totals)
+    batch_time = time.perf_counter() - start
+
+    expected_totals = np.array([total for total, _ in scalar])
+    expected_breakdown = np.array([[scores.get(key, np.nan) for key in SURVEY_KEYS] for _, scores in scalar])
+    assert np.array_equal(totals, expected_totals), "총점 불일치"
+    assert np.array_equal(breakdown, expected_breakdown, equal_nan=True), "문항별 점수 불일치"
+    assert types.tolist() == scalar_types, "투자성향 불일치"
+
+    print(f"응답 {n_rows:,}건")
+    print(f"calculate_score + classify (반복): {scalar_time * 1000:8.1f} ms")
+    print(f"answers_to_table (dict → 배열):   {convert_time * 1000:8.1f} ms")
+    print(f"score_batch + classify_batch:     {batch_time * 1000:8.1f} ms")
+    print(f"speedup (채점·분류)            : {scalar_time / batch_time:8.1f}x")
@@ -0,0 +1,55 @@
+# benchmarks/bench_company_search.py — 종목 페이지 회사명 검색: str.contains 전체 행 검색 vs CompanySearchIndex
+#
+# 실행: python benchmarks/bench_company_search.py [회사 수] [연도 수]
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from stock_index import CompanySearchIndex, is_initials_query  # noqa: E402
+
+QUERIES = ["전자", "삼성", "1", "회사12", "바이오", "ㅅㅅ", "ㅎㅅㄱ", "없는회사"]
+SYLLABLES = list("가나다라마바사아자차카타파하삼성전자현대화학바이오제약건설금융")
+
+
+def make_names(n_companies, seed=0):
+    """무작위 회사명 n_companies개 (중복 없음)."""
+    rng = np.random.default_rng(seed)
+    names = set()
+    while len(names) < n_companies:
+        body = "".join(rng.choice(SYLLABLES, rng.integers(2, 6)))
+        names.add(body if rng.random() < 0.8 else f"회사{len(names)}{body}")
+    return sorted(names)
+
+
+if __name__ == "__main__":
+    n_companies = int(sys.argv[1]) if len(sys.argv) > 1 else 2_500
+    n_years = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    names = make_names(n_companies)
+    column = pd.Series(np.tile(names, n_years)).astype('category')
+
+    start = time.perf_counter()
+    index = CompanySearchIndex(column)
+    build_time = time.perf_counter() - start
+
+    scan_time = indexed_time = 0.0
+    for query in QUERIES:
+        start = time.perf_counter()
+        expected = column.str.contains(query, case=False, na=False, regex=False).to_numpy()
+        scan_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        mask = index.row_mask(query)
+        indexed_time += time.perf_counter() - start
+        if not is_initials_query(query): # 초성 검색은 str.contains로 비교할 수 없음
+            assert np.array_equal(mask, expected), query
+
+    print(f"회사 {n_companies:,}개 × {n_years}년 = {len(column):,}행, 검색어 {len(QUERIES)}개")
+    print(f"색인 생성 (버전당 한 번):      {build_time * 1000:8.2f} ms")
+    print(f"str.contains (검색어당):       {scan_time / len(QUERIES) * 1000:8.3f} ms")
+    print(f"CompanySearchIndex (검색어당): {indexed_time / len(QUERIES) * 1000:8.3f} ms")
+    print(f"초성 'ㅅㅅ' 일치 회사 수: {len(index.match('ㅅㅅ'))}")
@@ -0,0 +1,78 @@
+# benchmarks/bench_import_time.py — 페이지별 모듈 import 시간
+#
+# 각 페이지 스크립트의 최상위 import 문만 새 파이썬 프로세스에서 실행해(python -X importtime),
+# 페이지가 처음 실행될 때 치르는 import 비용과 그때 함께 로드되는 무거운 모듈을 보여줍니다.
+# (함수 안에서 늦게 import하는 모듈은 실제로 필요해질 때 로드되므로 포함되지 않습니다.)
+# 시간은 여러 번 실행한 중앙값입니다. 인터프리터 시작 때 로드되는 모듈(site 등)은 빼고,
+# "streamlit 제외"는 같은 실행에서 streamlit 자체의 누적 시간을 뺀 값이라 음수가 되지 않습니다.
+#
+# 실행: python benchmarks/bench_import_time.py [반복 횟수]
+
+import ast
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+SCRIPTS = [
+    "app.py",
+    "pages/01_questionnaire.py",
+    "pages/02_analyzing.py",
+    "pages/03_result.py",
+    "pages/03_1_kyc_rule.py",
+    "pages/04_dashboard.py",
+    "pages/05_individual_stock_analysis.py",
+]
+HEAVY_MODULES = ["pandas", "numpy", "pyarrow", "plotly.express"]
+START_MARKER = "colorsys" # 페이지 import 앞에 실행하는 가벼운 모듈 (이 줄 이전의 -X importtime 출력은 인터프리터 시작 비용)
+
+
+def top_level_imports(script):
+    """스크립트의 최상위 import 문 (함수 안의 import는 제외)."""
+    tree = ast.parse((ROOT / script).read_text(encoding="utf-8"))
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def import_ms(stderr):
+    """-X importtime 출력에서 START_MARKER 이후 최상위(들여쓰기 없는) 모듈의 (누적 시간 합계, 그중 streamlit을 뺀 합계) ms."""
+    total_us = streamlit_us = 0
+    started = False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() == START_MARKER:
+            started = True
+        elif started and len(name) - len(name.lstrip()) == 1:
+            total_us += int(cumulative)
+            if name.strip() == "streamlit":
+                streamlit_us += int(cumulative)
+    return total_us / 1000, (total_us - streamlit_us) / 1000
+
+
+def measure(statements, repeat):
+    """새 프로세스에서 statements를 repeat번 실행해 (import 시간 중앙값 ms, streamlit 제외 중앙값 ms, 로드된 무거운 모듈)을 반환합니다."""
+    code = "\n".join([f"import {START_MARKER}"] + statements + [
+        "import sys as _sys, json as _json",
+        f"print(_json.dumps([m for m in {HEAVY_MODULES!r} if m in _sys.modules]))",
+    ])
+    times = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        )
+        times.append(import_ms(result.stderr))
+    totals, without_streamlit = zip(*times)
+    return statistics.median(totals), statistics.median(without_streamlit), json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    streamlit_ms, _, _ = measure(["import streamlit"], repeat)
+    print(f"{'streamlit 자체':<40} {streamlit_ms:8.1f} ms   (중앙값 {repeat}회)")
+    for script in SCRIPTS:
+        elapsed_ms, own_ms, heavy = measure(top_level_imports(script), repeat)
+        print(f"{script:<40} {elapsed_ms:8.1f} ms  (streamlit 제외 {own_ms:7.1f} ms)  {', '.join(heavy) or '-'}")
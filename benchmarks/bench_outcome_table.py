@@ -0,0 +1,51 @@
+# benchmarks/bench_outcome_table.py — 모든 응답 조합 결과표: 생성 시간, 조회 vs calculate_score, 전체 조합 일치 확인
+#
+# 실행: python benchmarks/bench_outcome_table.py
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from survey import calculate_score, classify_investment_type  # noqa: E402
+from survey_batch import SURVEY_KEYS, MULTI_SELECT_KEYS, OutcomeTable, decode_answer_codes  # noqa: E402
+
+
+def answers_for(digits, row):
+    """결과표 자릿값을 설문 페이지 형식의 answers dict로 바꿉니다."""
+    answers = {}
+    for key in SURVEY_KEYS:
+        digit = int(digits[key][row])
+        answers[key] = [i for i in range(5) if digit >> i & 1] if key in MULTI_SELECT_KEYS else digit
+    return answers
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    table = OutcomeTable()
+    build_time = time.perf_counter() - start
+
+    digits = decode_answer_codes(np.arange(table.size))
+    all_answers = [answers_for(digits, row) for row in range(table.size)]
+
+    start = time.perf_counter()
+    scalar = [calculate_score(answers) for answers in all_answers]
+    scalar_types = [classify_investment_type(total) for total, _ in scalar]
+    scalar_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    looked_up = [table.lookup(answers) for answers in all_answers]
+    lookup_time = time.perf_counter() - start
+
+    for (total, breakdown), investment_type, outcome in zip(scalar, scalar_types, looked_up):
+        assert outcome == (total, breakdown, *investment_type), (outcome, total, breakdown, investment_type)
+
+    print(f"응답 조합 {table.size:,}가지, 결과표 {table.totals.nbytes + table.type_codes.nbytes:,} bytes")
+    print(f"결과표 생성:                          {build_time * 1000:8.1f} ms")
+    print(f"calculate_score + classify (조합당): {scalar_time / table.size * 1e6:8.2f} us")
+    print(f"OutcomeTable.lookup (조합당):        {lookup_time / table.size * 1e6:8.2f} us"
+          f"  (직접 계산 대비 {lookup_time / scalar_time:.2f}배 — 한 건 채점은 calculate_score가 더 빠름)")
+    print("유형별 조합 수:", table.type_distribution())
+    print("문항별 유형 변경 가능 비율:", {key: round(rate, 3) for key, rate in table.flip_rates().items()})
@@ -0,0 +1,76 @@
+# benchmarks/bench_risk_levels.py — '위험도' 계산: 기존 groupby-rolling + merge 방식 vs compute_risk_levels
+#
+# 실행: python benchmarks/bench_risk_levels.py [행 수]
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from data_pipeline import compute_risk_levels  # noqa: E402
+
+COL_C1, COL_C2 = '이자보상배율(이자비용)', '영업활동으로 인한 현금흐름(*)(천원)'
+
+
+def make_panel(n_rows, years_per_company=8, seed=0):
+    rng = np.random.default_rng(seed)
+    n_companies = n_rows // years_per_company
+    df = pd.DataFrame({
+        '거래소코드': np.repeat([f"{i:06d}" for i in range(n_companies)], years_per_company),
+        '회계년도': np.tile(np.arange(2015, 2015 + years_per_company), n_companies),
+    })
+    n = len(df)
+    df[COL_C1] = np.where(rng.random(n) < 0.5, 0.5, rng.normal(3, 2, n))
+    df[COL_C2] = rng.normal(0, 1, n)
+    df.loc[rng.random(n) < 0.03, COL_C1] = np.nan
+    df.loc[rng.random(n) < 0.03, COL_C2] = np.nan
+    return df.sample(frac=1, random_state=seed).reset_index(drop=True)
+
+
+def legacy_risk_levels(df_processed):
+    """변경 전 load_and_process_data의 위험도 계산 (비교 기준)."""
+    df_processed = df_processed.sort_values(by=['거래소코드', '회계년도'], ascending=True)
+    temp_df = df_processed[['거래소코드', '회계년도', COL_C1, COL_C2]].copy()
+    temp_df['C1_flag'] = (temp_df[COL_C1].fillna(999) < 1).astype(int)
+    temp_df['C2_flag'] = (temp_df[COL_C2].fillna(9999) < 0).astype(int)
+    temp_df['C1_3yr_sum'] = temp_df.groupby('거래소코드')['C1_flag'].rolling(window=3, min_periods=1).sum().reset_index(level=0, drop=True)
+    temp_df['C2_3yr_sum'] = temp_df.groupby('거래소코드')['C2_flag'].rolling(window=3, min_periods=1).sum().reset_index(level=0, drop=True)
+    temp_df['C1_met'] = (temp_df['C1_3yr_sum'] == 3)
+    temp_df['C2_met'] = (temp_df['C2_3yr_sum'] == 3)
+    conditions = [temp_df['C1_met'] & temp_df['C2_met'], temp_df['C1_met'] | temp_df['C2_met']]
+    temp_df['위험도'] = np.select(conditions, [2, 1], default=0)
+    df_processed = df_processed.merge(temp_df[['거래소코드', '회계년도', '위험도']], on=['거래소코드', '회계년도'], how='left')
+    return df_processed['위험도'].astype(int).to_numpy()
+
+
+def vectorized_risk_levels(df_processed):
+    df_processed = df_processed.sort_values(by=['거래소코드', '회계년도'], ascending=True)
+    return compute_risk_levels(
+        df_processed['거래소코드'].to_numpy(dtype=object, na_value=None),
+        df_processed[COL_C1].to_numpy(dtype=float, na_value=np.nan),
+        df_processed[COL_C2].to_numpy(dtype=float, na_value=np.nan),
+    )
+
+
+def best_of(func, arg, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(arg)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    panel = make_panel(n_rows)
+    t_legacy, expected = best_of(legacy_risk_levels, panel)
+    t_vector, actual = best_of(vectorized_risk_levels, panel)
+    assert np.array_equal(expected, actual), "위험도 결과가 기존 방식과 다릅니다."
+    print(f"rows={len(panel):,}")
+    print(f"legacy groupby-rolling+merge : {t_legacy * 1000:8.1f} ms")
+    print(f"compute_risk_levels (정렬 포함): {t_vector * 1000:8.1f} ms")
+    print(f"speedup                      : {t_legacy / t_vector:8.1f}x")
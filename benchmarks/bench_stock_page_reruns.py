@@ -0,0 +1,100 @@
+# benchmarks/bench_stock_page_reruns.py — 개별 종목 페이지: 상호작용당 서버 CPU 시간 (전체 재실행 vs 조각(fragment)만 재실행)
+#
+# streamlit.testing의 AppTest로 페이지를 실행합니다. 포트폴리오 분석 결과(차트)가 보이는 상태에서 같은 위젯 조작을
+# 1) 전체 스크립트 재실행(조각으로 나누기 전의 동작)과 2) 그 위젯이 속한 조각만 재실행으로 각각 반복해 CPU 시간을 비교합니다.
+# (AppTest 자체의 결과 파싱 시간도 양쪽에 똑같이 포함됩니다.)
+#
+# 실행: python benchmarks/bench_stock_page_reruns.py [반복 횟수]
+
+import functools
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import streamlit.testing.v1.local_script_runner as local_script_runner
+from streamlit.runtime.scriptrunner import RerunData
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+PAGE = ROOT / "pages" / "05_individual_stock_analysis.py"
+
+
+def fragment_ids(at):
+    """{조각 함수 이름: fragment id} — AppTest가 보관하는 조각 저장소에서 찾습니다."""
+    ids = {}
+    for fragment_id, wrapped in at._fragment_storage._fragments.items():
+        for cell in wrapped.__closure__ or ():
+            func = cell.cell_contents
+            if callable(func) and hasattr(func, "__name__"):
+                ids.setdefault(func.__name__, fragment_id)
+    return ids
+
+
+def run_fragment(at, fragment_id):
+    """브라우저가 조각 안의 위젯을 조작했을 때처럼 해당 조각만 다시 실행합니다."""
+    original = local_script_runner.RerunData
+    local_script_runner.RerunData = functools.partial(
+        RerunData, fragment_id=fragment_id, fragment_id_queue=[fragment_id], is_fragment_scoped_rerun=True,
+    )
+    try:
+        at.run()
+    finally:
+        local_script_runner.RerunData = original
+
+
+def button(at, label):
+    return next(b for b in at.button if label in b.label)
+
+
+def selectbox(at, label):
+    return next(s for s in at.selectbox if s.label == label)
+
+
+# (설명, 위젯 조작 함수(반복 번호를 받음), 위젯이 속한 조각)
+INTERACTIONS = [
+    ("표 페이지 이동", lambda at, i: at.number_input(key='stock_table_page').set_value(2 + i % 2), "stock_table_section"),
+    ("종목명 검색", lambda at, i: at.text_input[0].input("회사1" if i % 2 else "ㅅㅅ"), "stock_table_section"),
+    ("선택 추가 (상위 5개)", lambda at, i: button(at, "상위 5개").click(), "stock_table_section"),
+    ("정렬 기준 변경", lambda at, i: selectbox(at, "정렬 기준").set_value("CAGR" if i % 2 else "연간변동성"), "stock_filter_section"),
+    ("포트폴리오 분석 실행", lambda at, i: button(at, "분석 실행").click(), "portfolio_section"),
+]
+
+
+def new_session():
+    at = AppTest.from_file(str(PAGE), default_timeout=120)
+    at.session_state['logged_in'] = True
+    at.session_state['survey_completed'] = True
+    at.run()
+    button(at, "상위 5개").click().run()
+    button(at, "분석 실행").click().run() # 결과 차트가 보이는 상태에서 측정
+    return at
+
+
+def measure(at, interact, fragment_id, repeat):
+    at.run() # 조각만 실행한 뒤에는 결과 트리에 그 조각의 위젯만 남으므로, 측정 전에 전체를 한 번 그립니다.
+    times = []
+    for i in range(repeat):
+        interact(at, i)
+        start = time.process_time()
+        if fragment_id is None:
+            at.run()
+        else:
+            run_fragment(at, fragment_id)
+        times.append(time.process_time() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return statistics.median(times) * 1000
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    full_session, fragment_session = new_session(), new_session()
+    ids = fragment_ids(fragment_session)
+
+    print(f"{'상호작용':<20} {'전체 재실행':>12} {'조각만 재실행':>14}   (CPU ms, 중앙값 {repeat}회)")
+    for label, interact, fragment in INTERACTIONS:
+        full_ms = measure(full_session, interact, None, repeat)
+        fragment_ms = measure(fragment_session, interact, ids[fragment], repeat)
+        print(f"{label:<20} {full_ms:12.1f} {fragment_ms:14.1f}   ({fragment})")
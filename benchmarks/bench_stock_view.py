@@ -0,0 +1,72 @@
+# benchmarks/bench_stock_view.py — 종목 표 필터·정렬: isin + sort_values vs StockViewIndex (전체 조합 결과 일치 확인)
+#
+# 실행: python benchmarks/bench_stock_view.py [행 수]
+
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from stock_index import StockViewIndex  # noqa: E402
+
+CLASS_FILTERS = [[0, 1, 2, 3], [0], [1], [2], [3]]
+SORT_COLUMNS = ['회사명', '초과수익률_apply', 'CAGR', '연간변동성']
+
+
+def make_frame(n_rows, nan_rate=0.02, seed=0):
+    """종목 페이지 컬럼을 흉내 낸 무작위 DataFrame (일부 수치는 결측)."""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({
+        '회사명': pd.Series([f"회사{i}" for i in rng.integers(0, n_rows // 20 + 1, n_rows)]).astype('category'),
+        'target_class': rng.integers(-1, 4, n_rows).astype('int8'),
+    })
+    for column in SORT_COLUMNS[1:]:
+        values = rng.normal(5, 20, n_rows).round(1) # 같은 값이 자주 나오도록 반올림
+        values[rng.random(n_rows) < nan_rate] = np.nan
+        frame[column] = values
+    return frame
+
+
+def sort_key(frame, column):
+    """비교용: 회사명은 문자열, 수치는 결측을 맨 뒤로 보낸 값 목록."""
+    values = frame[column]
+    return values.astype(str).tolist() if column == '회사명' else values.to_numpy()
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    frame = make_frame(n_rows)
+    combos = [(classes, column, ascending) for classes in CLASS_FILTERS for column in SORT_COLUMNS for ascending in (True, False)]
+
+    start = time.perf_counter()
+    expected = [frame[frame['target_class'].isin(classes)].sort_values(column, ascending=ascending) for classes, column, ascending in combos]
+    pandas_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    index = StockViewIndex(frame)
+    for _, column, ascending in combos[:len(SORT_COLUMNS) * 2]:
+        index.order(column, ascending)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for classes, column, ascending in combos:
+        index.positions(classes, column, ascending)
+    positions_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = [frame.take(index.positions(classes, column, ascending)) for classes, column, ascending in combos]
+    indexed_time = time.perf_counter() - start
+
+    for (_, column, _), want, got in zip(combos, expected, results):
+        assert set(want.index) == set(got.index)
+        assert np.array_equal(np.asarray(sort_key(want, column)), np.asarray(sort_key(got, column)), equal_nan=column != '회사명')
+        assert got[column].isna().sum() == 0 or got[column].iloc[-got[column].isna().sum():].isna().all(), "결측값이 맨 뒤가 아님"
+
+    print(f"{n_rows:,}행, 필터·정렬 조합 {len(combos)}개")
+    print(f"isin + sort_values (조합당):      {pandas_time / len(combos) * 1000:8.3f} ms")
+    print(f"StockViewIndex 생성 (버전당 한 번): {build_time * 1000:8.3f} ms")
+    print(f"positions (조합당):               {positions_time / len(combos) * 1000:8.3f} ms")
+    print(f"positions + take (조합당):        {indexed_time / len(combos) * 1000:8.3f} ms")
@@ -0,0 +1,159 @@
+# bulk_recommend.py — 고객 설문 응답 CSV 일괄 분류·추천 (브라우저 없이 실행)
+#
+# 설문 응답을 채점해 투자성향과 대시보드의 Class 그룹으로 분류하고, 최신 연도 백테스팅 상위 10개 추천 종목을 붙여 저장합니다.
+#
+#   python bulk_recommend.py clients.csv -o results.csv [--workers 4] [--chunk-rows 20000]
+#
+# 입력 CSV: 문항 key 컬럼(age, investment_period, investment_experience, knowledge_level, asset_ratio,
+# income_source, risk_tolerance)에 0부터 시작하는 선택지 번호를 넣습니다. 중복 선택 문항(investment_experience)은
+# 선택지 i를 1 << i 비트로 표시한 비트마스크입니다. (예: 1번과 4번 선택 → 0b1001 = 9) 빈 칸은 미응답이며,
+# 설문 페이지의 calculate_score처럼 점수에서 빠집니다. 그 외 컬럼(고객 ID 등)은 결과에 그대로 남깁니다.
+#
+# 출력: results.csv (고객별 총점·문항별 점수·투자성향·Class 그룹·추천 종목) 와
+#       results_recommendations.csv (Class 그룹별 추천 종목 상세, 그룹 × 10행)
+
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline import (
+    BACKTEST_COLUMNS, BACKTEST_TOP_N, INVESTMENT_GROUP_MAP, STOCK_DATASET_PATH,
+    BacktestStore, DatasetError, artifacts_dir_for, ensure_current_artifact, load_backtest_artifact, open_artifact,
+)
+from survey_batch import MISSING_ANSWER, SURVEY_KEYS, classify_batch, score_batch
+
+BULK_CHUNK_ROWS = 20_000 # 작업 프로세스 하나가 한 번에 처리하는 행 수
+OUTPUT_ENCODING = "utf-8-sig" # 엑셀에서 바로 열 수 있도록 BOM 포함
+
+# 작업 프로세스 안에서 공유하는 Class 그룹별 추천 요약 (_init_worker에서 한 번 설정)
+_GROUP_SUMMARY = None
+
+
+def load_recommendations(workbook_path=None):
+    """
+    현재 아티팩트의 백테스팅 결과에서 Class 그룹별 최신 연도 추천 종목을 가져옵니다. (없으면 아티팩트를 먼저 생성)
+    반환: (BacktestStore, 추천 종목 상세 DataFrame)
+    """
+    path = Path(workbook_path) if workbook_path else STOCK_DATASET_PATH
+    manifest = ensure_current_artifact(path)
+    store = open_artifact(artifacts_dir_for(path), manifest)
+    frame = store.frame(BACKTEST_COLUMNS)
+    backtest = load_backtest_artifact(store.version, frame) or BacktestStore(frame, store.version, BACKTEST_TOP_N)
+    details = [
+        recommendations.assign(Class그룹=label, 순위=np.arange(1, len(recommendations) + 1))
+        for label, recommendations in backtest.latest_recommendations.items()
+    ]
+    details = pd.concat(details, ignore_index=True) if details else pd.DataFrame(columns=['Class그룹', '순위'])
+    details['회계년도'] = backtest.latest_year
+    return backtest, details
+
+
+def group_summary(details):
+    """Class 그룹별로 고객 행에 붙일 요약 {그룹: {'추천종목_회사명': ..., '추천종목_거래소코드': ..., '추천_평균CAGR': ...}}."""
+    summary = {}
+    for label, rows in details.groupby('Class그룹', sort=False):
+        summary[label] = {
+            '추천종목_회사명': ";".join(rows['회사명'].astype(str)),
+            '추천종목_거래소코드': ";".join(rows['거래소코드'].astype(str)),
+            '추천_평균CAGR': float(rows['CAGR'].mean()),
+        }
+    return summary
+
+
+def _init_worker(summary):
+    global _GROUP_SUMMARY
+    _GROUP_SUMMARY = summary
+
+
+def classify_chunk(chunk, summary=None):
+    """응답 행 묶음을 채점·분류하고 추천 요약을 붙인 DataFrame을 반환합니다. (작업 프로세스에서 실행)"""
+    summary = summary if summary is not None else _GROUP_SUMMARY
+    codes = {key: chunk[key].fillna(MISSING_ANSWER).to_numpy(dtype=np.int64) for key in SURVEY_KEYS}
+    totals, breakdown = score_batch(codes)
+    types, _ = classify_batch(totals)
+
+    result = chunk.copy()
+    for column, key in enumerate(SURVEY_KEYS):
+        result[f"점수_{key}"] = breakdown[:, column]
+    result['총점'] = totals
+    result['투자성향'] = types
+    groups = pd.Series(types).map(INVESTMENT_GROUP_MAP)
+    result['Class그룹'] = groups.to_numpy()
+    for field in ('추천종목_회사명', '추천종목_거래소코드', '추천_평균CAGR'):
+        result[field] = groups.map({label: values[field] for label, values in summary.items()}).to_numpy()
+    return result
+
+
+def run(input_path, output_path, workers=None, chunk_rows=None, workbook_path=None):
+    """입력 CSV를 청크 단위로 읽어 작업 프로세스들에 나눠 처리하고, 입력 순서대로 결과 CSV에 이어 씁니다. 처리한 행 수를 반환합니다."""
+    chunk_rows = chunk_rows or BULK_CHUNK_ROWS
+    output_path = Path(output_path)
+    _, details = load_recommendations(workbook_path)
+    summary = group_summary(details)
+    details.to_csv(output_path.with_name(f"{output_path.stem}_recommendations.csv"), index=False, encoding=OUTPUT_ENCODING)
+
+    reader = pd.read_csv(input_path, chunksize=chunk_rows, dtype={key: "Int64" for key in SURVEY_KEYS})
+    written = 0
+    with open(output_path, "w", encoding=OUTPUT_ENCODING, newline="") as output:
+        def write(result):
+            nonlocal written
+            result.to_csv(output, header=written == 0, index=False)
+            written += len(result)
+
+        if workers == 1:
+            for chunk in reader:
+                write(classify_chunk(_check_columns(chunk), summary))
+            return written
+
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(summary,)) as executor:
+            # 입력 전체를 한 번에 올리지 않도록 진행 중인 청크 수를 작업 프로세스 수의 두 배로 제한
+            pending = deque()
+            for chunk in reader:
+                pending.append(executor.submit(classify_chunk, _check_columns(chunk)))
+                if len(pending) >= 2 * workers:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    return written
+
+
+def _check_columns(chunk):
+    missing = [key for key in SURVEY_KEYS if key not in chunk.columns]
+    if missing:
+        raise DatasetError(f"입력 CSV에 다음 문항 컬럼이 없습니다: {', '.join(missing)}")
+    return chunk
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="고객 설문 응답 CSV를 일괄 분류하고 추천 종목을 붙입니다.")
+    parser.add_argument("input", help="설문 응답 CSV")
+    parser.add_argument("-o", "--output", default="results.csv", help="결과 CSV (기본값: results.csv)")
+    parser.add_argument("--workers", type=int, help="작업 프로세스 수 (기본값: CPU 수, 1이면 현재 프로세스에서 처리)")
+    parser.add_argument("--chunk-rows", type=int, default=BULK_CHUNK_ROWS, help="청크당 행 수")
+    parser.add_argument("--dataset", default=str(STOCK_DATASET_PATH), help="종목 데이터 엑셀 경로 (아티팩트 위치 기준)")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    try:
+        rows = run(args.input, args.output, args.workers, args.chunk_rows, args.dataset)
+    except FileNotFoundError as e:
+        print(f"⚠️ 파일을 찾을 수 없습니다: {e.filename or e}", file=sys.stderr)
+        return 1
+    except (DatasetError, ValueError) as e:
+        print(f"⚠️ {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - started
+    print(f"{rows:,}명 처리 완료: {elapsed:.2f}초 ({rows / elapsed if elapsed else 0:,.0f}명/초) → {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
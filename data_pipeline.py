@@ -0,0 +1,1281 @@
+# data_pipeline.py — 종목 데이터 전처리 파이프라인 (Streamlit 없이 실행 가능)
+#
+# 엑셀 읽기 → 필수 컬럼 검증/숫자형 변환 → 위험도 → 연간변동성 4분위 → 백테스팅 결과까지 계산해
+# 버전별 아티팩트 디렉터리(data/artifacts/<엑셀 이름>/<버전>/)에 저장합니다.
+# 앱(utils.py)은 CURRENT 파일이 가리키는 아티팩트를 메모리 맵으로 붙여 쓰기만 합니다.
+#
+#   python data_pipeline.py build                        # 엑셀이 바뀌었으면 새 아티팩트를 만들고 현재 버전으로 지정
+#   python data_pipeline.py build --force                # 엑셀이 그대로여도 다시 생성
+#   python data_pipeline.py ingest data/stock_2023.xlsx  # 새 회계년도 행만 처리해 새 버전으로 추가
+#   python data_pipeline.py show                         # 현재 아티팩트의 manifest 출력
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import cached_property
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from stock_index import CompanySearchIndex, StockViewIndex
+
+try:
+    import fcntl # 여러 프로세스 간 아티팩트 생성 잠금 (POSIX 전용)
+except ImportError:
+    fcntl = None
+
+# 프로젝트 루트 기준 데이터 경로
+PROJECT_ROOT = Path(__file__).resolve().parent
+DATA_DIR = PROJECT_ROOT / "data"
+STOCK_DATASET_PATH = DATA_DIR / "stock_dataset.xlsx"
+
+# 전처리 로직이나 아티팩트 형식이 바뀌면 PIPELINE_VERSION을 올려 기존 아티팩트를 무효화합니다.
+PIPELINE_VERSION = 5
+_PARTITIONS_METADATA_KEY = b"year_partitions" # 아티팩트 스키마 메타데이터의 회계년도 파티션 색인
+
+logger = logging.getLogger(__name__)
+
+class DatasetError(ValueError):
+    """데이터 파일을 처리할 수 없을 때 발생합니다. 메시지는 사용자에게 그대로 보여줄 수 있는 문장입니다."""
+
+class EmptyDatasetError(DatasetError):
+    """전처리 후 분석할 행이 남지 않았을 때 발생합니다."""
+
+NO_ROWS_MESSAGE = "2017년 이후의 유효한 회계년도 데이터가 없어 분석을 수행할 수 없습니다."
+
+# --- 전처리 결과 DataFrame의 dtype 계획 ---
+# 모든 세션이 이 DataFrame을 공유하므로 메모리를 줄이면 서버당 동시 사용자 수가 늘어납니다.
+CATEGORICAL_COLUMNS = ['회사명', '산업명', '산업코드', '거래소코드', '위험도_라벨']
+INTEGER_COLUMNS = {'회계년도': 'int16', 'target_class': 'int8', '위험도': 'int8', 'vol_quartile': 'int8'}
+# 비율/수익률 컬럼은 float32로 줄일 수 있습니다. (천원 단위 금액 컬럼은 정밀도 때문에 float64 유지)
+RATIO_COLUMNS = [
+    '이자보상배율(이자비용)', '당좌비율', '정상영업이익증가율', '순이익증가율', '매출액증가율',
+    '연간변동성', 'x3', 'x4', 'roe', 'pcr', 'psr', 'ln(매출액)', '잉여현금흐름 비율', 'CAGR',
+    '배당수익률', '초과수익률_apply',
+]
+USE_FLOAT32_RATIOS = False # True로 바꾸면 비율 컬럼을 float32로 저장 (아티팩트도 자동으로 다시 생성됨)
+
+# 연간변동성 4분위(vol_quartile) 계산 방식
+# - "pooled": 전체 연도를 합쳐 한 번에 4분위 (기존 대시보드 방식)
+# - "per_year": 회계년도별로 4분위 (해당 시점 정보만 쓰는 point-in-time 백테스트에 적합)
+VOL_QUARTILE_MODE = "pooled"
+
+# 아티팩트 파일을 메모리 맵으로 붙여(zero-copy) 사용할지 여부
+# 같은 서버에서 여러 `streamlit run` 레플리카를 띄워도 데이터는 OS 페이지 캐시 한 벌만 차지하고,
+# 아티팩트 생성은 가장 먼저 시작한 레플리카 하나만 수행합니다. (메모리 맵 컬럼은 읽기 전용)
+MEMORY_MAP_DATASET = True
+
+# 엑셀 읽기 방식: "streaming"이면 openpyxl 읽기 전용 모드로 EXCEL_CHUNK_ROWS행씩 읽어 필요한 컬럼만 변환합니다.
+# (최대 메모리가 통합 문서 크기가 아니라 청크 크기에 비례) "full"이면 pd.read_excel로 한 번에 읽고 모든 컬럼을 유지합니다.
+EXCEL_INGEST_MODE = "streaming"
+EXCEL_CHUNK_ROWS = 20_000
+
+# --- Arrow 변환 ---
+
+def _year_partitions(years):
+    """회계년도 오름차순으로 정렬된 배열에서 {연도: (시작 행, 끝 행)} 구간을 구합니다."""
+    years = np.asarray(years)
+    values, starts = np.unique(years, return_index=True)
+    ends = np.append(starts[1:], len(years))
+    return {int(year): (int(start), int(end)) for year, start, end in zip(values, starts, ends)}
+
+def _frame_to_arrow(df):
+    """
+    DataFrame을 Arrow 테이블로 변환합니다.
+    실수 컬럼의 NaN은 null(유효성 비트맵)이 아닌 NaN 값 그대로 저장해야 메모리 맵으로 읽을 때 복사가 생기지 않습니다.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type) and table.column(i).null_count:
+            values = df[field.name].to_numpy(dtype=field.type.to_pandas_dtype())
+            table = table.set_column(i, field, pa.array(values, type=field.type, from_pandas=False))
+    return table
+
+# --- dtype 계획 적용 ---
+
+def apply_dtype_plan(df, float32_ratios=None):
+    """
+    전처리된 DataFrame에 선언된 dtype 계획을 적용합니다.
+    - 회사명/산업명/산업코드/거래소코드/위험도_라벨: category
+    - 회계년도: int16, target_class/위험도: int8
+    - 비율 컬럼: float32_ratios(기본값 USE_FLOAT32_RATIOS)가 True이면 float32
+    적용 전후 메모리 사용량을 로그로 남기고 df.attrs['memory_footprint']에도 기록합니다.
+    """
+    if float32_ratios is None:
+        float32_ratios = USE_FLOAT32_RATIOS
+    before = int(df.memory_usage(deep=True).sum())
+
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    for col, dtype in INTEGER_COLUMNS.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    if float32_ratios:
+        for col in RATIO_COLUMNS:
+            if col in df.columns:
+                df[col] = df[col].astype('float32')
+
+    after = int(df.memory_usage(deep=True).sum())
+    df.attrs['memory_footprint'] = {'before_bytes': before, 'after_bytes': after}
+    logger.info(
+        "stock dataset memory: %.2f MB -> %.2f MB (%.0f%%)",
+        before / 1e6, after / 1e6, 100 * after / before if before else 100,
+    )
+    return df
+
+
+# --- 연간변동성 4분위 ---
+
+def _quartile_bins(values):
+    """연간변동성 값을 1~4 분위로 나누고 (라벨, 구간 경계)를 반환합니다. 고유값이 4개 미만이면 (None, None)."""
+    if values.nunique() < 4:
+        return None, None
+    try:
+        labels, edges = pd.qcut(values, q=4, labels=[1, 2, 3, 4], retbins=True, duplicates='drop')
+    except ValueError: # 중복 경계가 제거되어 구간이 4개보다 적어진 경우
+        return None, None
+    return labels.astype(int), [float(edge) for edge in edges]
+
+def add_volatility_quartiles(df, mode=None):
+    """
+    '연간변동성' 4분위를 'vol_quartile'(1~4) 컬럼으로 추가하고, 구간 경계를 df.attrs['vol_quartile_edges']에 기록합니다.
+    (attrs는 Arrow 캐시에 함께 저장됩니다.)
+    - mode="pooled": 전체 행을 합쳐 한 번에 분위를 나눕니다. 경계: {'all': [...]}
+    - mode="per_year": 회계년도별로 분위를 나눕니다. 경계: {'2017': [...], ...}
+    분위를 나눌 수 없으면(고유값 4개 미만) 해당 행은 모두 1로 두고 경계는 None으로 기록합니다.
+    """
+    mode = mode or VOL_QUARTILE_MODE
+    if mode not in ("pooled", "per_year"):
+        raise ValueError(f"알 수 없는 vol_quartile 계산 방식: {mode}")
+    df = df.dropna(subset=['연간변동성'])
+
+    vol_quartile = pd.Series(1, index=df.index, dtype=int)
+    edges = {}
+    if mode == "pooled":
+        groups = [("all", df['연간변동성'])]
+    else:
+        groups = [(str(int(year)), values) for year, values in df.groupby('회계년도')['연간변동성']]
+    for key, values in groups:
+        labels, edges[key] = _quartile_bins(values)
+        if labels is not None:
+            vol_quartile.loc[labels.index] = labels
+
+    df = df.assign(vol_quartile=vol_quartile)
+    df.attrs['vol_quartile_edges'] = {'mode': mode, 'edges': edges}
+    return df
+
+
+# --- 위험도 계산 ---
+
+def _group_starts(codes):
+    """정렬된 코드 배열에서 각 행이 속한 그룹의 시작 위치를 반환합니다."""
+    n = len(codes)
+    is_start = np.ones(n, dtype=bool)
+    if n > 1:
+        is_start[1:] = codes[1:] != codes[:-1]
+    return np.maximum.accumulate(np.where(is_start, np.arange(n), 0))
+
+def _trailing_window_all(flags, group_start, window):
+    """그룹 내 직전 window개 행(자기 자신 포함)의 flag가 모두 True인지 누적합 차이로 계산합니다."""
+    n = len(flags)
+    csum = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(flags, out=csum[1:])
+    idx = np.arange(n)
+    full = idx - group_start >= window - 1
+    lo = np.where(full, idx + 1 - window, 0)
+    return full & (csum[idx + 1] - csum[lo] == window)
+
+def compute_risk_levels(codes, interest_coverage, operating_cash_flow, window=3,
+                        interest_coverage_threshold=1.0, operating_cash_flow_threshold=0.0):
+    """
+    거래소코드, 회계년도 순으로 정렬된 배열을 받아 행별 '위험도'(0/1/2)를 계산합니다.
+    - C1: 이자보상배율 < interest_coverage_threshold 가 같은 종목의 최근 window개 연도 모두 충족
+    - C2: 영업활동 현금흐름 < operating_cash_flow_threshold 가 최근 window개 연도 모두 충족
+    - C1, C2 모두 충족: 2 / 하나만 충족: 1 / 그 외(결측값, 연도 수 부족 포함): 0
+    groupby-rolling 대신 그룹 경계와 누적합 차이로 한 번에 계산하므로 merge나 임시 DataFrame이 필요 없습니다.
+    """
+    codes = np.asarray(codes, dtype=object)
+    valid_code = pd.notna(codes)
+    group_start = _group_starts(codes)
+    with np.errstate(invalid='ignore'):
+        c1_flag = np.asarray(interest_coverage, dtype=float) < interest_coverage_threshold
+        c2_flag = np.asarray(operating_cash_flow, dtype=float) < operating_cash_flow_threshold
+    c1_met = _trailing_window_all(c1_flag, group_start, window) & valid_code
+    c2_met = _trailing_window_all(c2_flag, group_start, window) & valid_code
+    return c1_met.astype(np.int64) + c2_met.astype(np.int64)
+
+# --- 엑셀 읽기와 행 단위 전처리 ---
+
+def dataset_version(fingerprint):
+    """엑셀 내용 해시와 전처리 설정으로 데이터셋 버전 ID를 만듭니다. (예: '3f2a9c1d04be-p5')"""
+    version = f"{fingerprint['sha256'][:12]}-p{fingerprint['pipeline_version']}"
+    if fingerprint.get("float32_ratios"):
+        version += "-f32"
+    if fingerprint.get("vol_quartile_mode", "pooled") != "pooled":
+        version += f"-{fingerprint['vol_quartile_mode']}"
+    for increment in fingerprint.get("increments", []):
+        version += f"+{increment['year']}"
+    return version
+
+# 필수 컬럼 정의 ('초과수익률' 제거됨)
+REQUIRED_STOCK_COLUMNS = [
+    '회사명', '거래소코드', '회계년도', '이자보상배율(이자비용)',
+    '영업활동으로 인한 현금흐름(*)(천원)', '투자활동으로 인한 현금흐름(*)(천원)',
+    '재무활동으로 인한 현금흐름(*)(천원)', '당좌비율', '정상영업이익증가율',
+    '순이익증가율', '매출액증가율', '유동자산(*)(천원)', '부채(*)(천원)',
+    '당기순이익(손실)(천원)', '산업코드', '산업명', '수정종가',
+    '연간변동성', 'EBITDA(천원)', 'x3', 'x4', 'roe', 'pcr',
+    'psr', 'ln(매출액)', '잉여현금흐름 비율', 'CAGR', 'target_class'
+]
+RISK_COLUMNS = ('이자보상배율(이자비용)', '영업활동으로 인한 현금흐름(*)(천원)')
+RISK_WINDOW = 3 # 위험도 판정에 쓰는 최근 회계년도 수
+RISK_LABELS = {0: '저위험', 1: '중위험', 2: '고위험'}
+
+def _process_stock_frame(df, path, timings=None):
+    """엑셀에서 읽은 원본 DataFrame에 전체 전처리를 적용합니다. (처리할 행이 없으면 EmptyDatasetError)"""
+    return _finish_stock_frame(_clean_stock_rows(df, path), timings)
+
+def _finish_stock_frame(df_processed, timings=None):
+    """
+    행 단위 전처리가 끝난 전체 행에 종목/연도 간 계산(위험도, 변동성 분위)과 정렬, dtype 계획을 적용합니다.
+    timings(dict)를 주면 단계별 소요 시간(초)을 기록합니다.
+    """
+    timings = timings if timings is not None else {}
+    started = time.perf_counter()
+    col_c1, col_c2 = RISK_COLUMNS
+    if col_c1 in df_processed.columns and col_c2 in df_processed.columns:
+        df_processed.sort_values(by=['거래소코드', '회계년도'], ascending=True, inplace=True)
+        df_processed.reset_index(drop=True, inplace=True)
+
+        # 최근 3개 회계년도 연속으로 이자보상배율 < 1 (C1), 영업현금흐름 < 0 (C2)인지 판정
+        # 둘 다 충족: 고위험(2), 하나만 충족: 중위험(1), 3년치 데이터가 부족하거나 미충족: 저위험(0)
+        df_processed['위험도'] = compute_risk_levels(
+            df_processed['거래소코드'].to_numpy(dtype=object, na_value=None),
+            df_processed[col_c1].to_numpy(dtype=float, na_value=np.nan),
+            df_processed[col_c2].to_numpy(dtype=float, na_value=np.nan),
+            window=RISK_WINDOW,
+        )
+        df_processed['위험도_라벨'] = df_processed['위험도'].map(RISK_LABELS)
+    else:
+        logger.warning("'이자보상배율(이자비용)' 또는 '영업활동으로 인한 현금흐름(*)(천원)' 컬럼이 없어 '위험도'를 계산할 수 없습니다.")
+    timings['risk_levels'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    if '연간변동성' in df_processed.columns:
+        df_processed = add_volatility_quartiles(df_processed)
+    else:
+        logger.warning("'연간변동성' 컬럼이 없어 분위수(vol_quartile)를 계산할 수 없습니다.")
+    timings['vol_quartiles'] = time.perf_counter() - started
+
+    # 연도별 슬라이스/파티션이 연속 구간이 되도록 (회계년도, 거래소코드) 순으로 저장
+    started = time.perf_counter()
+    df_processed = df_processed.sort_values(by=['회계년도', '거래소코드'], ignore_index=True)
+    df_processed = apply_dtype_plan(df_processed)
+    timings['finalize'] = time.perf_counter() - started
+    return df_processed
+
+def _clean_stock_rows(df, path):
+    """
+    행 단위 전처리: 필수 컬럼 확인, 숫자형 변환/결측 처리, 2017년 이후 필터링. (다른 행과 무관하므로 새 연도 행에만 적용 가능)
+    필수 컬럼이 없으면 DatasetError, 남는 행이 없으면 EmptyDatasetError가 발생합니다.
+    """
+    _check_required_columns(df.columns, path)
+    df_processed = _coerce_stock_rows(df)
+    if df_processed.empty:
+        raise EmptyDatasetError(NO_ROWS_MESSAGE)
+    return df_processed
+
+def _check_required_columns(columns, path):
+    missing_cols = [col for col in REQUIRED_STOCK_COLUMNS if col not in columns]
+    if missing_cols:
+        raise DatasetError(f"데이터 파일 '{path}'에 다음 필수 컬럼이 누락되었습니다: {', '.join(missing_cols)}")
+
+# 숫자형 컬럼 ('초과수익률' 제거됨)
+NUMERIC_STOCK_COLUMNS = [
+    '이자보상배율(이자비용)', '영업활동으로 인한 현금흐름(*)(천원)',
+    '투자활동으로 인한 현금흐름(*)(천원)', '재무활동으로 인한 현금흐름(*)(천원)',
+    '당좌비율', '정상영업이익증가율', '순이익증가율', '매출액증가율',
+    '유동자산(*)(천원)', '부채(*)(천원)', '당기순이익(손실)(천원)',
+    '수정종가', '연간변동성', 'EBITDA(천원)', 'x3', 'x4',
+    'roe', 'pcr', 'psr', 'ln(매출액)', '잉여현금흐름 비율', 'CAGR',
+    'target_class'
+]
+
+def _coerce_stock_rows(df):
+    """숫자형 변환 및 NaN 처리, 배당수익률 보충, 2017년 이후 필터링. ('회계년도' 컬럼 필요, 경고 없이 빈 DataFrame 반환 가능)"""
+    for col in NUMERIC_STOCK_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+            if col in ['연간변동성', 'CAGR']: 
+                df[col] = df[col].fillna(0) 
+            elif col == 'target_class': 
+                 df[col] = df[col].fillna(-1).astype(int) 
+        
+    if '배당수익률' not in df.columns:
+        df['배당수익률'] = np.random.uniform(0, 5, len(df))
+
+    df.dropna(subset=['회사명', '회계년도'], inplace=True) 
+
+    df_processed = df.copy() 
+    
+    # --- 2017년 이후 데이터만 필터링 ---
+    df_processed['회계년도'] = pd.to_numeric(df_processed['회계년도'], errors='coerce')
+    df_processed.dropna(subset=['회계년도'], inplace=True) 
+    return df_processed[df_processed['회계년도'] >= 2017].copy()
+
+
+# --- 대용량 엑셀 스트리밍 읽기 ---
+# pd.read_excel은 openpyxl로 통합 문서 전체를 메모리에 올리므로 최대 메모리가 파일 크기의 몇 배가 됩니다.
+# 스트리밍 모드는 openpyxl 읽기 전용 모드로 행을 EXCEL_CHUNK_ROWS개씩 읽어, 필요한 컬럼만 골라 타입 변환한 뒤
+# 곧바로 Arrow 스테이징 파일에 씁니다. 이후 단계는 타입이 정해진 필요한 컬럼만 다루므로 원본 셀 객체는 한 청크만 메모리에 있습니다.
+
+OPTIONAL_STOCK_COLUMNS = ['배당수익률', '초과수익률_apply'] # 있으면 함께 읽는 선택 컬럼
+TEXT_STOCK_COLUMNS = ['회사명', '거래소코드', '산업코드', '산업명']
+# pandas가 결측값으로 읽는 엑셀 문자열 (오류 셀 포함)
+_EXCEL_NA_STRINGS = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null', '#DIV/0!', '#VALUE!', '#REF!', '#NAME?', '#NUM!', '#NULL!',
+])
+
+def _excel_text(value):
+    """텍스트 컬럼 셀 값을 문자열로 바꿉니다. (정수 값의 실수는 pandas처럼 정수로, 결측 문자열은 None으로)"""
+    if value is None or (isinstance(value, str) and value in _EXCEL_NA_STRINGS):
+        return None
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+def _staging_schema(columns):
+    fields = []
+    for col in columns:
+        if col in TEXT_STOCK_COLUMNS:
+            fields.append(pa.field(col, pa.large_string()))
+        elif col == 'target_class':
+            fields.append(pa.field(col, pa.int64()))
+        else:
+            fields.append(pa.field(col, pa.float64()))
+    return pa.schema(fields)
+
+def _read_excel_streaming(path, artifacts_dir=None, chunk_rows=None):
+    """
+    엑셀 첫 시트를 openpyxl 읽기 전용 모드로 청크 단위로 읽어 행 단위 전처리(_coerce_stock_rows)까지 적용하고,
+    (전처리된 행 DataFrame, 읽은 행 수)를 반환합니다. (필수/선택 컬럼 외의 컬럼은 읽지 않음)
+    청크는 artifacts_dir(없으면 artifacts_dir_for(path)) 아래 임시 디렉터리의 Arrow 파일에 모았다가 한 번에 읽으며, 임시 디렉터리는 실패해도 지웁니다.
+    텍스트 컬럼은 문자열로 읽되, 거래소코드 외의 컬럼은 모든 값이 숫자로 해석되면 pd.read_excel처럼 숫자형으로 되돌립니다.
+    """
+    from openpyxl import load_workbook
+
+    chunk_rows = chunk_rows or EXCEL_CHUNK_ROWS
+    artifacts_dir = Path(artifacts_dir) if artifacts_dir else artifacts_dir_for(path)
+    staging_dir = artifacts_dir / f".staging.{os.getpid()}.{threading.get_ident()}.tmp"
+    staging_path = staging_dir / "rows.arrow"
+    workbook = None
+    try:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        staging_dir.mkdir(parents=True)
+        workbook = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, ())
+        positions = {}
+        for i, name in enumerate(header):
+            if name is not None and str(name) not in positions:
+                positions[str(name)] = i
+        _check_required_columns(positions, path)
+
+        columns = [col for col in positions if col in REQUIRED_STOCK_COLUMNS or col in OPTIONAL_STOCK_COLUMNS]
+        if '배당수익률' not in columns:
+            columns.append('배당수익률') # _coerce_stock_rows가 채움
+        schema = _staging_schema(columns)
+        input_rows = 0
+
+        with pa.OSFile(str(staging_path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            while True:
+                chunk = [row for row in islice(rows, chunk_rows) if any(value is not None for value in row)]
+                if not chunk:
+                    break
+                input_rows += len(chunk)
+                data = {}
+                for col in columns:
+                    if col not in positions:
+                        continue
+                    i = positions[col]
+                    values = [row[i] if i < len(row) else None for row in chunk]
+                    if col in TEXT_STOCK_COLUMNS:
+                        values = [_excel_text(value) for value in values]
+                    elif col in OPTIONAL_STOCK_COLUMNS:
+                        values = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce')
+                    data[col] = values
+                df_chunk = _coerce_stock_rows(pd.DataFrame(data))
+                writer.write_table(pa.Table.from_pandas(df_chunk[columns], schema=schema, preserve_index=False))
+                del chunk, data, df_chunk
+
+        with pa.OSFile(str(staging_path), "rb") as source:
+            df_processed = pa.ipc.open_file(source).read_all().to_pandas()
+    finally:
+        if workbook is not None:
+            workbook.close()
+        shutil.rmtree(staging_dir, ignore_errors=True)
+    if df_processed.empty:
+        raise EmptyDatasetError(NO_ROWS_MESSAGE)
+    for col in TEXT_STOCK_COLUMNS:
+        if col != '거래소코드' and col in df_processed.columns:
+            try:
+                df_processed[col] = pd.to_numeric(df_processed[col])
+            except (ValueError, TypeError):
+                pass
+    return df_processed, input_rows
+
+def _read_excel_full(path):
+    """pd.read_excel로 통합 문서 전체를 읽고 (전처리된 행 DataFrame, 읽은 행 수)를 반환합니다. (모든 컬럼 유지)"""
+    df = pd.read_excel(path, dtype={'거래소코드': str})
+    return _clean_stock_rows(df, path), len(df)
+
+# --- 동시 호출 합치기 (single-flight) ---
+# 캐시가 만료되거나 배포 직후 여러 세션이 동시에 같은 무거운 계산을 시작하면 CPU/메모리가 세션 수만큼 늘어납니다.
+# 같은 key로 이미 실행 중인 계산이 있으면 새로 실행하지 않고 그 결과를 기다렸다가 함께 받습니다.
+
+class _LeaderAborted(Exception):
+    """single-flight에서 먼저 실행한 호출이 Exception이 아닌 이유(st.stop() 등)로 중단되었음을 기다리던 호출에 알립니다."""
+
+class SingleFlight:
+    """같은 key의 동시 호출을 하나의 실행으로 합치고, 합쳐진 호출 수를 집계합니다."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._stats = {}
+
+    def do(self, key, func, *args):
+        """
+        key에 대해 실행 중인 계산이 없으면 func(*args)를 실행하고, 있으면 그 결과(또는 예외)를 함께 받습니다.
+        결과는 저장하지 않으므로 완료된 뒤의 호출은 다시 실행됩니다. (결과 캐싱은 호출하는 쪽이 담당)
+        Exception이 아닌 중단(st.stop()의 StopException 등)은 실행한 세션의 흐름 제어이므로 전달하지 않고,
+        기다리던 호출이 각자 func(*args)를 다시 실행해 자기 화면에 오류를 표시하게 합니다.
+        """
+        name = key[0] if isinstance(key, tuple) else key
+        with self._lock:
+            stats = self._stats.setdefault(name, {'calls': 0, 'executions': 0, 'coalesced': 0})
+            stats['calls'] += 1
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = self._in_flight[key] = Future()
+                stats['executions'] += 1
+            else:
+                stats['coalesced'] += 1
+
+        if not leader:
+            logger.info("single-flight: %s 계산이 진행 중이므로 결과를 기다립니다.", key)
+            try:
+                return future.result()
+            except _LeaderAborted:
+                return func(*args)
+
+        try:
+            result = func(*args)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        except BaseException:
+            future.set_exception(_LeaderAborted())
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def stats(self):
+        """{이름: {'calls', 'executions', 'coalesced'}} 집계 사본과 현재 진행 중인 key 수."""
+        with self._lock:
+            return {
+                'by_name': {name: dict(counts) for name, counts in self._stats.items()},
+                'in_flight': len(self._in_flight),
+            }
+
+_SINGLE_FLIGHT = SingleFlight()
+
+def single_flight(key, func, *args):
+    """프로세스 전체에서 공유하는 SingleFlight로 func(*args)를 실행합니다. 같은 key로 진행 중인 계산이 있으면 그 결과를 함께 받습니다."""
+    return _SINGLE_FLIGHT.do(key, func, *args)
+
+def single_flight_stats():
+    """데이터셋 로드/백테스팅 계산에서 합쳐진(coalesced) 호출 수 등 single-flight 집계를 반환합니다."""
+    return _SINGLE_FLIGHT.stats()
+
+# --- 백테스팅 엔진 ---
+
+# 투자성향 Class 그룹: Class k = target_class ∈ [0, k] 이고 vol_quartile ∈ [1, k+1]
+# 조건이 중첩되어 있으므로(Class 0 ⊂ Class 1 ⊂ Class 2 ⊂ Class 3) 행마다 속하는 가장 작은 Class(level)를 구하면
+# "Class k에 속함" ⇔ level <= k 입니다.
+BACKTEST_CLASS_LABELS = ['Class 0 (Q1)', 'Class 1 (Q1~Q2)', 'Class 2 (Q1~Q3)', 'Class 3 (Q1~Q4)']
+BACKTEST_TOP_N = 10
+RECOMMENDATION_COLUMNS = ['회사명', '거래소코드', 'CAGR', '연간변동성', 'target_class']
+# 백테스팅(대시보드)에 필요한 컬럼 — 대시보드는 전체 데이터 대신 이 컬럼만 로드합니다.
+BACKTEST_COLUMNS = ['회계년도', '회사명', '거래소코드', 'CAGR', '연간변동성', 'target_class', 'vol_quartile']
+
+def _top_k_positions(values, k):
+    """values에서 큰 값 k개의 위치를 내림차순으로 반환합니다. (전체 정렬 대신 argpartition)"""
+    if len(values) > k:
+        candidates = np.argpartition(-values, k - 1)[:k]
+    else:
+        candidates = np.arange(len(values))
+    return candidates[np.argsort(-values[candidates], kind='stable')]
+
+def run_backtest(df, top_n=BACKTEST_TOP_N):
+    """
+    모든 (회계년도, Class 그룹)의 CAGR 상위 top_n 종목과 평균 CAGR을 한 번에 계산합니다.
+    df에는 '회계년도', 'target_class', 'vol_quartile', 'CAGR', '회사명' 컬럼이 필요합니다.
+
+    1) 행마다 level = max(target_class, vol_quartile - 1)을 구하고,
+    2) (연도, level) 그룹마다 상위 top_n 후보만 부분 선택(argpartition)한 뒤,
+    3) Class k의 상위 top_n은 level <= k 후보들 중 상위 top_n으로 구합니다.
+       (합집합의 상위 top_n은 각 부분집합 상위 top_n의 합집합 안에 있으므로 결과가 같습니다.)
+    연산량은 행 수에 선형이며, Class 수 × 연도 수만큼 DataFrame을 복사/정렬하지 않습니다.
+
+    반환: ({(연도, Class 라벨): 상위 종목의 행 위치 배열}, {f"{연도} - {라벨}": {'mean_cagr', 'recommended_stocks'}})
+    """
+    years = pd.to_numeric(df['회계년도'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    target_class = pd.to_numeric(df['target_class'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    vol_quartile = pd.to_numeric(df['vol_quartile'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+    cagr = pd.to_numeric(df['CAGR'], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+    with np.errstate(invalid='ignore'):
+        level = np.maximum(target_class, vol_quartile - 1)
+        valid = ((target_class >= 0) & (target_class <= 3) & (vol_quartile >= 1) & (vol_quartile <= 4)
+                 & ~np.isnan(years) & ~np.isnan(cagr) & df['회사명'].notna().to_numpy())
+    n_classes = len(BACKTEST_CLASS_LABELS)
+
+    all_years = sorted(int(y) for y in np.unique(years[~np.isnan(years)]))
+    positions = np.flatnonzero(valid)
+    group_ids = ((years[positions] - (all_years[0] if all_years else 0)) * n_classes + level[positions]).astype(np.int16)
+    order = np.argsort(group_ids, kind='stable') # int16 키의 stable 정렬은 radix sort (행 수에 선형)
+    positions, group_ids = positions[order], group_ids[order]
+    boundaries = np.flatnonzero(np.diff(group_ids)) + 1
+    candidates_by_year = {}
+    for group in np.split(positions, boundaries):
+        if len(group) == 0:
+            continue
+        top = group[_top_k_positions(cagr[group], top_n)]
+        candidates_by_year.setdefault(int(years[group[0]]), []).append(top)
+
+    company_names = df['회사명']
+    top_positions = {}
+    results_all_conditions = {}
+    for year in all_years:
+        candidates = np.concatenate(candidates_by_year.get(year, [np.array([], dtype=np.intp)]))
+        candidates = candidates[np.argsort(-cagr[candidates], kind='stable')]
+        for k, label in enumerate(BACKTEST_CLASS_LABELS):
+            top = candidates[level[candidates] <= k][:top_n]
+            top_positions[(year, label)] = top
+            results_all_conditions[f"{year} - {label}"] = {
+                'mean_cagr': float(cagr[top].mean()) if len(top) else 0.0,
+                'recommended_stocks': [
+                    {'회사명': name, 'CAGR': value} for name, value in zip(company_names.iloc[top].tolist(), cagr[top].tolist())
+                ],
+            }
+    return top_positions, results_all_conditions
+
+# 대시보드에 오는 투자성향별로 사용할 Class 그룹 ('안정형'은 주식 추천 대상이 아니므로 제외)
+INVESTMENT_GROUP_MAP = {
+    '안정추구형': 'Class 0 (Q1)',
+    '위험중립형': 'Class 1 (Q1~Q2)',
+    '적극투자형': 'Class 2 (Q1~Q3)',
+    '공격투자형': 'Class 3 (Q1~Q4)',
+}
+
+class BacktestStore:
+    """
+    데이터셋 버전 하나에 대해 모든 연도 × 모든 Class 그룹의 백테스팅 결과를 한 번만 계산해 두는 저장소입니다.
+    투자성향별 결과는 view()로 O(1)에 꺼내 쓰며, 결과 객체는 모든 세션이 공유하므로 수정하지 않습니다.
+    """
+
+    def __init__(self, frame, version=None, top_n=BACKTEST_TOP_N, base=None):
+        """
+        base(이전 버전의 BacktestStore)가 주어지면 base.latest_year 이후 연도만 계산해 base의 결과에 더합니다.
+        이전 연도 행이 바뀌지 않은 증분 추가(연도별 분위)에서만 사용하며, frame은 회계년도 오름차순이어야 합니다.
+        """
+        self.version = version
+        self.top_n = top_n
+        self.results_all_conditions = {}
+        start = 0
+        if base is not None and base.latest_year is not None:
+            self.results_all_conditions.update(base.results_all_conditions)
+            start = int(np.searchsorted(frame['회계년도'].to_numpy(), base.latest_year, side='right'))
+        top_positions, results = run_backtest(frame.iloc[start:], top_n)
+        self.results_all_conditions.update(results)
+        self.latest_year = max((year for year, _ in top_positions), default=None)
+
+        if self.latest_year is None and base is not None:
+            self.latest_year, self._latest_positions = base.latest_year, base._latest_positions
+        else:
+            self._latest_positions = {
+                label: start + top_positions[(self.latest_year, label)]
+                for label in BACKTEST_CLASS_LABELS if (self.latest_year, label) in top_positions
+            }
+        self._set_latest_recommendations(frame)
+
+    def _set_latest_recommendations(self, frame):
+        cols = [col for col in RECOMMENDATION_COLUMNS if col in frame.columns]
+        self.latest_recommendations = {label: frame.iloc[positions][cols] for label, positions in self._latest_positions.items()}
+        self._empty_recommendations = pd.DataFrame(columns=RECOMMENDATION_COLUMNS)
+
+    def to_payload(self):
+        """아티팩트(backtest.json)로 저장할 수 있는 dict. 최신 추천 종목은 전체 데이터의 행 위치로 저장합니다."""
+        return {
+            'version': self.version,
+            'top_n': self.top_n,
+            'latest_year': self.latest_year,
+            'results_all_conditions': self.results_all_conditions,
+            'latest_positions': {label: [int(p) for p in positions] for label, positions in self._latest_positions.items()},
+        }
+
+    @classmethod
+    def from_payload(cls, frame, payload, version=None):
+        """to_payload()로 저장한 결과를 다시 계산하지 않고 불러옵니다. frame은 저장할 때와 같은 버전의 전체 연도 데이터여야 합니다."""
+        store = cls.__new__(cls)
+        store.version = version or payload.get('version')
+        store.top_n = payload.get('top_n', BACKTEST_TOP_N)
+        store.results_all_conditions = payload['results_all_conditions']
+        store.latest_year = payload['latest_year']
+        store._latest_positions = {label: np.asarray(positions, dtype=np.intp) for label, positions in payload['latest_positions'].items()}
+        store._set_latest_recommendations(frame)
+        return store
+
+    @property
+    def empty(self):
+        return not self.results_all_conditions
+
+    def view(self, investment_type):
+        """
+        (results_all_conditions, latest_recommendations_for_type)를 반환합니다.
+        - results_all_conditions: {f"{year} - {label}": {'mean_cagr': float, 'recommended_stocks': list of dicts}}
+        - latest_recommendations_for_type: 해당 투자성향 Class 그룹의 최신 연도 상위 10개 종목
+        """
+        label = INVESTMENT_GROUP_MAP.get(investment_type)
+        return self.results_all_conditions, self.latest_recommendations.get(label, self._empty_recommendations)
+
+# --- 프로세스 전체에서 공유하는 읽기 전용 데이터셋 ---
+
+STOCK_KEY_COLUMNS = ['회계년도', '거래소코드'] # 조회 결과에 항상 포함되는 컬럼 (연도 구간/정렬 기준)
+
+class StockStore:
+    """
+    전처리 캐시 한 버전(회계년도 순으로 정렬된 Arrow 테이블)에 대한 조회 객체입니다.
+    행이 회계년도별 연속 구간(파티션)으로 저장되어 있어, 페이지가 선언한 컬럼과 연도만 복사 없이 잘라 DataFrame으로 만듭니다.
+    메모리 맵 모드에서는 조회하지 않은 컬럼/연도의 페이지는 디스크에서 읽히지도 않습니다.
+    같은 조건의 조회 결과(StockDataset)는 버전마다 한 번만 만들어 모든 세션이 공유합니다.
+    """
+
+    def __init__(self, table, version):
+        self._table = table
+        self.version = version
+        self._queries = {}
+
+    @property
+    def column_names(self):
+        return self._table.column_names
+
+    @property
+    def num_rows(self):
+        return self._table.num_rows
+
+    @cached_property
+    def year_partitions(self):
+        """{회계년도: (시작 행, 끝 행)} — 캐시에 저장된 색인을 쓰고, 없으면 회계년도 컬럼에서 계산합니다."""
+        raw = (self._table.schema.metadata or {}).get(_PARTITIONS_METADATA_KEY)
+        if raw:
+            return {int(year): tuple(bounds) for year, bounds in json.loads(raw).items()}
+        if '회계년도' not in self._table.column_names:
+            return {}
+        return _year_partitions(self._table.column('회계년도').to_numpy())
+
+    @property
+    def years(self):
+        return sorted(self.year_partitions)
+
+    @property
+    def latest_year(self):
+        return self.years[-1] if self.year_partitions else None
+
+    def _query_key(self, columns, years):
+        if columns is not None:
+            wanted = set(columns) | set(STOCK_KEY_COLUMNS)
+            columns = tuple(col for col in self._table.column_names if col in wanted)
+        if years is not None:
+            years = tuple(sorted({int(year) for year in years}))
+        return columns, years
+
+    def frame(self, columns=None, years=None):
+        """
+        columns(없으면 전체)와 years(없으면 전체 연도)에 해당하는 부분만 담은 새 DataFrame을 만듭니다.
+        데이터에 없는 컬럼은 무시하고, 회계년도/거래소코드는 항상 포함합니다.
+        """
+        columns, years = self._query_key(columns, years)
+        table = self._table
+        if years is not None:
+            # 인접한 연도 파티션은 하나의 구간으로 합쳐, 연속된 연도 조회는 복사 없는 슬라이스 하나가 되도록 합니다.
+            ranges = []
+            for start, end in (self.year_partitions[year] for year in years if year in self.year_partitions):
+                if ranges and ranges[-1][1] == start:
+                    ranges[-1][1] = end
+                else:
+                    ranges.append([start, end])
+            pieces = [table.slice(start, end - start) for start, end in ranges] or [table.slice(0, 0)]
+            table = pieces[0] if len(pieces) == 1 else pa.concat_tables(pieces)
+        if columns is not None:
+            table = table.select(list(columns))
+        df = table.to_pandas(split_blocks=True)
+        df.attrs['dataset_version'] = self.version
+        return df
+
+    def query(self, columns=None, years=None):
+        """frame()과 같은 조건의 공유 StockDataset을 반환합니다. (버전·조건별로 한 번만 만들고 재사용)"""
+        key = self._query_key(columns, years)
+        dataset = self._queries.get(key)
+        if dataset is None:
+            dataset = single_flight(("stock_query", self.version, key), self._build_query, key)
+        return dataset
+
+    def _build_query(self, key):
+        if key not in self._queries:
+            self._queries[key] = StockDataset(self.frame(*key), self.version)
+        return self._queries[key]
+
+class StockDataset:
+    """
+    전처리된 종목 데이터를 프로세스 전체에서 하나만 두고 모든 세션이 공유하기 위한 객체입니다.
+    frame은 모든 세션이 같은 객체를 보므로 절대 제자리(inplace)에서 수정하지 말고,
+    필요한 경우 필터링/assign 등으로 새 DataFrame을 만들어 사용합니다.
+    행은 (회계년도, 거래소코드) 순으로 정렬되어 있어 연도별 그룹은 복사 없는 슬라이스입니다.
+    """
+
+    def __init__(self, frame, version=None):
+        # 캐시는 이미 연도순으로 저장되므로 보통은 정렬(=메모리 맵 사본 생성)이 일어나지 않습니다.
+        if '회계년도' in frame.columns and not frame['회계년도'].is_monotonic_increasing:
+            frame = frame.sort_values(by=['회계년도', '거래소코드'], kind='mergesort', ignore_index=True)
+        self._frame = frame
+        self.version = version or frame.attrs.get('dataset_version')
+        self._snapshots = {}
+
+    @property
+    def frame(self):
+        return self._frame
+
+    @property
+    def empty(self):
+        return self._frame.empty
+
+    @property
+    def vol_quartile_edges(self):
+        """전처리 때 계산된 연간변동성 4분위 경계 ({'mode': ..., 'edges': {...}})."""
+        return self._frame.attrs.get('vol_quartile_edges')
+
+    @cached_property
+    def years(self):
+        if self.empty:
+            return []
+        return sorted(int(y) for y in self._frame['회계년도'].unique())
+
+    @cached_property
+    def _year_bounds(self):
+        years = self._frame['회계년도'].to_numpy()
+        starts = np.searchsorted(years, self.years, side='left')
+        ends = np.searchsorted(years, self.years, side='right')
+        return {year: (int(a), int(b)) for year, a, b in zip(self.years, starts, ends)}
+
+    def year_frame(self, year):
+        """특정 회계년도의 행 (복사 없는 슬라이스)."""
+        start, end = self._year_bounds.get(int(year), (0, 0))
+        return self._frame.iloc[start:end]
+
+    @cached_property
+    def by_year(self):
+        """{회계년도: 해당 연도 DataFrame 슬라이스} (연도 오름차순)."""
+        return {year: self.year_frame(year) for year in self.years}
+
+    @property
+    def latest_year(self):
+        return self.years[-1] if self.years else None
+
+    @cached_property
+    def latest_year_snapshot(self):
+        """가장 최근 회계년도의 행만 담은 슬라이스."""
+        if self.latest_year is None:
+            return self._frame.iloc[0:0]
+        return self.year_frame(self.latest_year)
+
+    def snapshot(self, as_of_year=None):
+        """
+        회사(거래소코드)별로 as_of_year(없으면 가장 최근 연도) 이하에서 가장 최근 회계년도의 행 하나씩만 담은 StockDataset.
+        frame의 index는 거래소코드(문자열)이며, 기준 연도마다 한 번만 만들어 모든 세션이 공유합니다.
+        """
+        year = self.latest_year if as_of_year is None else int(as_of_year)
+        snapshot = self._snapshots.get(year)
+        if snapshot is None:
+            snapshot = self._snapshots[year] = StockDataset(self._company_snapshot_frame(year), self.version)
+        return snapshot
+
+    def _company_snapshot_frame(self, year):
+        # 행이 (회계년도, 거래소코드) 순이므로, year 이하 구간에서 거래소코드별 마지막 행이 그 회사의 가장 최근 연도 행입니다.
+        end = 0 if year is None else int(np.searchsorted(self._frame['회계년도'].to_numpy(), year, side='right'))
+        codes, _ = pd.factorize(self._frame['거래소코드'].iloc[:end])
+        present = np.flatnonzero(codes >= 0)
+        _, last_in_reversed = np.unique(codes[present][::-1], return_index=True)
+        positions = np.sort(present[::-1][last_in_reversed])
+        frame = self._frame.take(positions)
+        frame.index = pd.Index(frame['거래소코드'].astype(str).to_numpy(), name='거래소코드')
+        return frame
+
+    @cached_property
+    def search_index(self):
+        """회사명 검색 색인 (stock_index.CompanySearchIndex). 반환하는 행 위치는 frame 기준입니다."""
+        return CompanySearchIndex(self._frame['회사명'] if '회사명' in self._frame.columns else [])
+
+    @cached_property
+    def view_index(self):
+        """필터·정렬 색인 (stock_index.StockViewIndex). 반환하는 행 위치는 frame 기준입니다."""
+        return StockViewIndex(self._frame)
+
+# --- 버전별 아티팩트 ---
+# data/artifacts/<엑셀 이름>/
+#   CURRENT               현재 버전 ID (원자적으로 교체)
+#   <버전>/dataset.arrow  전처리된 전체 데이터 (Arrow IPC, 회계년도 파티션 색인 포함)
+#   <버전>/backtest.json  백테스팅 결과 (BacktestStore.to_payload)
+#   <버전>/manifest.json  버전, 원본 지문, 설정, 행 수, 단계별 소요 시간
+
+ARTIFACTS_DIR_NAME = "artifacts"
+ARTIFACT_DATASET_FILE = "dataset.arrow"
+ARTIFACT_BACKTEST_FILE = "backtest.json"
+ARTIFACT_MANIFEST_FILE = "manifest.json"
+CURRENT_POINTER_FILE = "CURRENT"
+ARTIFACT_KEEP_VERSIONS = 2 # 현재 버전 외에 남겨 둘 이전 버전 수 (이전 버전에 고정된 세션/다른 레플리카용)
+
+_ARTIFACT_DIRS = {}  # {버전 ID: 아티팩트 디렉터리} — open_artifact로 연 버전의 백테스팅 결과 위치
+
+def artifacts_dir_for(workbook_path):
+    """엑셀 파일별 아티팩트 디렉터리 (예: data/artifacts/stock_dataset)."""
+    path = Path(workbook_path)
+    return path.parent / ARTIFACTS_DIR_NAME / path.stem
+
+def _file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _workbook_fingerprint(path, known=None):
+    """
+    엑셀 파일의 크기, 수정시각(mtime), 내용 해시와 전처리 설정으로 지문을 만듭니다.
+    크기와 mtime이 이미 알고 있는 값과 같으면 해시 계산(파일 전체 읽기)을 생략합니다.
+    """
+    stat = path.stat()
+    if known and known.get("size") == stat.st_size and known.get("mtime_ns") == stat.st_mtime_ns:
+        sha256 = known["sha256"]
+    else:
+        sha256 = _file_sha256(path)
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256,
+        "pipeline_version": PIPELINE_VERSION,
+        "float32_ratios": USE_FLOAT32_RATIOS,
+        "vol_quartile_mode": VOL_QUARTILE_MODE,
+        "excel_ingest_mode": EXCEL_INGEST_MODE,
+    }
+
+def _fingerprint_matches(cached, fingerprint):
+    """엑셀 내용과 전처리 설정이 같은지 비교합니다. (크기/mtime/증분 이력은 비교하지 않음)"""
+    keys = ("sha256", "pipeline_version", "float32_ratios", "vol_quartile_mode", "excel_ingest_mode")
+    return all(cached.get(key) == fingerprint[key] for key in keys)
+
+def _write_atomic(path, text):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_text(text, encoding="utf-8")
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+def _write_json(path, data):
+    _write_atomic(path, json.dumps(data, ensure_ascii=False, indent=2))
+
+def read_current_manifest(artifacts_dir):
+    """CURRENT가 가리키는 아티팩트의 manifest를 읽습니다. (없거나 손상되었으면 None)"""
+    artifacts_dir = Path(artifacts_dir)
+    try:
+        version = (artifacts_dir / CURRENT_POINTER_FILE).read_text(encoding="utf-8").strip()
+        return json.loads((artifacts_dir / version / ARTIFACT_MANIFEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+
+def check_current_artifact(workbook_path, artifacts_dir=None):
+    """
+    현재 아티팩트가 엑셀과 일치하면 (manifest, 지문)을, 없거나 엑셀/전처리 설정이 바뀌었으면 (None, 새 지문)을 반환합니다.
+    엑셀 없이 아티팩트만 배포한 경우에는 현재 아티팩트를 그대로 사용합니다. (둘 다 없으면 FileNotFoundError)
+    """
+    path = Path(workbook_path)
+    artifacts_dir = Path(artifacts_dir) if artifacts_dir else artifacts_dir_for(path)
+    manifest = read_current_manifest(artifacts_dir)
+    if not path.exists():
+        if manifest is None:
+            raise FileNotFoundError(path)
+        return manifest, manifest["source"]
+
+    cached = manifest["source"] if manifest else None
+    fingerprint = _workbook_fingerprint(path, known=cached)
+    if cached is None or not _fingerprint_matches(cached, fingerprint):
+        return None, fingerprint
+
+    # 증분 추가된 연도는 엑셀 밖에 있으므로, 엑셀 내용이 같으면 아티팩트에 기록된 증분 이력을 그대로 이어받습니다.
+    if cached.get("increments"):
+        fingerprint["increments"] = cached["increments"]
+    if cached != fingerprint:
+        # 내용은 같고 mtime만 바뀐 경우(복사/touch): 다음 확인부터 해시 계산을 건너뛰도록 manifest의 지문만 갱신
+        manifest = dict(manifest, source=fingerprint)
+        try:
+            _write_json(artifacts_dir / manifest["version"] / ARTIFACT_MANIFEST_FILE, manifest)
+        except OSError:
+            pass
+    return manifest, fingerprint
+
+@contextmanager
+def _build_lock(artifacts_dir):
+    """
+    아티팩트 생성 구간을 프로세스 간 파일 잠금으로 보호합니다.
+    여러 레플리카가 동시에 시작해도 엑셀은 하나만 파싱하고, 나머지는 기다렸다가 만들어진 아티팩트를 붙여 씁니다.
+    """
+    if fcntl is None:
+        yield
+        return
+    try:
+        artifacts_dir.mkdir(parents=True, exist_ok=True)
+        lock_file = open(artifacts_dir / ".build.lock", "a")
+    except OSError:
+        yield
+        return
+    with lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def ensure_current_artifact(workbook_path=None, artifacts_dir=None):
+    """현재 아티팩트의 manifest를 반환합니다. 엑셀과 맞지 않으면 (다른 프로세스와 겹치지 않게 잠근 뒤) 새로 만듭니다."""
+    path = Path(workbook_path) if workbook_path else STOCK_DATASET_PATH
+    artifacts_dir = Path(artifacts_dir) if artifacts_dir else artifacts_dir_for(path)
+    manifest, _ = check_current_artifact(path, artifacts_dir)
+    if manifest is None:
+        with _build_lock(artifacts_dir):
+            # 잠금을 기다리는 동안 다른 프로세스가 아티팩트를 만들었을 수 있으므로 다시 확인
+            manifest, fingerprint = check_current_artifact(path, artifacts_dir)
+            if manifest is None:
+                manifest = _build_artifacts(path, artifacts_dir, fingerprint)
+    return manifest
+
+def build_artifacts(workbook_path=None, artifacts_dir=None):
+    """엑셀이 바뀌지 않았어도 전체 파이프라인을 다시 실행해 새 아티팩트를 만들고 현재 버전으로 지정합니다."""
+    path = Path(workbook_path) if workbook_path else STOCK_DATASET_PATH
+    artifacts_dir = Path(artifacts_dir) if artifacts_dir else artifacts_dir_for(path)
+    with _build_lock(artifacts_dir):
+        return _build_artifacts(path, artifacts_dir, _workbook_fingerprint(path))
+
+def _build_artifacts(path, artifacts_dir, fingerprint):
+    timings = {}
+    started = time.perf_counter()
+    try:
+        if EXCEL_INGEST_MODE == "streaming":
+            df_rows, input_rows = _read_excel_streaming(path, artifacts_dir)
+        else:
+            df_rows, input_rows = _read_excel_full(path)
+    except (FileNotFoundError, DatasetError):
+        raise
+    except Exception as e:
+        raise DatasetError(f"데이터 로드 중 오류 발생: {e}") from e
+    timings['ingest'] = time.perf_counter() - started
+
+    df_processed = _finish_stock_frame(df_rows, timings)
+    manifest = _write_artifact(
+        artifacts_dir, df_processed, fingerprint, timings,
+        source_path=path, input_rows=input_rows, started=started,
+    )
+    publish_artifact(artifacts_dir, manifest['version'])
+    return manifest
+
+def _write_artifact(artifacts_dir, df, fingerprint, timings, source_path, input_rows, started, backtest_base=None, parent_version=None):
+    """
+    전처리된 데이터(DataFrame 또는 Arrow 테이블)와 그 백테스팅 결과, manifest를 새 버전 디렉터리에 저장합니다.
+    임시 디렉터리에 모두 쓴 뒤 이름을 바꾸므로, 반쯤 쓰인 버전 디렉터리는 보이지 않습니다.
+    """
+    version = dataset_version(fingerprint)
+    target = artifacts_dir / version
+    tmp_dir = artifacts_dir / f".{version}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    try:
+        step = time.perf_counter()
+        table = df if isinstance(df, pa.Table) else _frame_to_arrow(df)
+        metadata = dict(table.schema.metadata or {})
+        partitions = _year_partitions(table.column('회계년도').to_numpy())
+        metadata[_PARTITIONS_METADATA_KEY] = json.dumps(partitions).encode()
+        table = table.replace_schema_metadata(metadata)
+        with pa.OSFile(str(tmp_dir / ARTIFACT_DATASET_FILE), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        timings['write_dataset'] = time.perf_counter() - step
+
+        # 백테스팅은 앱과 같은 경로(메모리 맵 → 필요한 컬럼만 조회)로 방금 쓴 파일에서 계산합니다.
+        step = time.perf_counter()
+        store = StockStore(_open_table(tmp_dir / ARTIFACT_DATASET_FILE), version)
+        backtest = BacktestStore(store.frame(BACKTEST_COLUMNS), version, BACKTEST_TOP_N, backtest_base)
+        _write_json(tmp_dir / ARTIFACT_BACKTEST_FILE, backtest.to_payload())
+        timings['backtest'] = time.perf_counter() - step
+        timings['total'] = time.perf_counter() - started
+
+        manifest = {
+            'version': version,
+            'parent_version': parent_version,
+            'created_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'source_path': str(source_path),
+            'source': fingerprint,
+            'rows': {
+                'input': int(input_rows),
+                'processed': table.num_rows,
+                'by_year': {str(year): end - start for year, (start, end) in partitions.items()},
+            },
+            'columns': table.column_names,
+            'files': {'dataset': ARTIFACT_DATASET_FILE, 'backtest': ARTIFACT_BACKTEST_FILE},
+            'timings_seconds': {name: round(seconds, 4) for name, seconds in timings.items()},
+        }
+        _write_json(tmp_dir / ARTIFACT_MANIFEST_FILE, manifest)
+
+        if target.exists():
+            # 같은 버전을 다시 만든 경우(--force): 기존 디렉터리를 치운 뒤 교체 (이미 붙여 쓰는 프로세스의 메모리 맵은 유지됨)
+            stale = artifacts_dir / f".{version}.{os.getpid()}.old"
+            os.rename(target, stale)
+            shutil.rmtree(stale, ignore_errors=True)
+        os.rename(tmp_dir, target)
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    logger.info("아티팩트 생성: %s (%d행, %.2f초)", target, manifest['rows']['processed'], timings['total'])
+    return manifest
+
+def publish_artifact(artifacts_dir, version):
+    """CURRENT가 version을 가리키도록 원자적으로 바꾸고, 오래된 버전 디렉터리를 정리합니다."""
+    _write_atomic(artifacts_dir / CURRENT_POINTER_FILE, version)
+    versions = sorted(
+        (entry for entry in artifacts_dir.iterdir()
+         if entry.is_dir() and not entry.name.startswith(".") and entry.name != version),
+        key=lambda entry: entry.stat().st_mtime, reverse=True,
+    )
+    for entry in versions[ARTIFACT_KEEP_VERSIONS:]:
+        shutil.rmtree(entry, ignore_errors=True)
+
+def _open_table(dataset_path, memory_map=None):
+    """
+    Arrow IPC 파일을 테이블로 엽니다.
+    memory_map(기본값 MEMORY_MAP_DATASET)이면 파일을 메모리 맵으로 붙이므로 테이블은 페이지 캐시를 그대로 참조하고,
+    실제로 조회하는 컬럼/연도 구간의 페이지만 읽힙니다. (맵은 버퍼가 살아있는 동안 유지)
+    """
+    if memory_map is None:
+        memory_map = MEMORY_MAP_DATASET
+    if memory_map:
+        return pa.ipc.open_file(pa.memory_map(str(dataset_path), "r")).read_all()
+    with pa.OSFile(str(dataset_path), "rb") as source:
+        return pa.ipc.open_file(source).read_all()
+
+def open_artifact(artifacts_dir, manifest, memory_map=None):
+    """manifest가 가리키는 아티팩트의 데이터를 StockStore로 엽니다. (파일을 붙이기만 하고 실제 데이터는 조회할 때 읽힘)"""
+    directory = Path(artifacts_dir) / manifest['version']
+    store = StockStore(_open_table(directory / ARTIFACT_DATASET_FILE, memory_map), manifest['version'])
+    _ARTIFACT_DIRS[store.version] = directory
+    return store
+
+def load_backtest_artifact(version, frame):
+    """open_artifact로 연 버전의 저장된 백테스팅 결과를 불러옵니다. (없으면 None — 호출하는 쪽에서 계산)"""
+    directory = _ARTIFACT_DIRS.get(version)
+    if directory is None:
+        return None
+    try:
+        payload = json.loads((directory / ARTIFACT_BACKTEST_FILE).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if payload.get('top_n', BACKTEST_TOP_N) != BACKTEST_TOP_N:
+        return None
+    return BacktestStore.from_payload(frame, payload, version)
+
+# --- 새 회계년도 증분 추가 ---
+# 새 회계년도 재무 데이터가 들어오면 엑셀 전체를 다시 처리하지 않고, 새 행만 전처리해 처리된 데이터 뒤에 붙입니다.
+# 위험도는 직전 연도들만 보는 계산이므로 기존 행은 바뀌지 않고, 새 행만 종목별 직전 (RISK_WINDOW - 1)개 행과 함께 계산합니다.
+
+def _risk_context_rows(dataset, codes, need):
+    """새 행의 위험도 계산에 필요한 종목별 직전 행들을 최근 연도부터 거슬러 올라가며 모읍니다. (보통 1~2개 연도만 읽음)"""
+    codes = pd.Index(pd.unique(codes))
+    counts = pd.Series(0, index=codes)
+    context = []
+    for year in reversed(dataset.years):
+        rows = dataset.year_frame(year)
+        rows = rows[rows['거래소코드'].isin(codes)]
+        context.append(rows)
+        counts = counts.add(rows['거래소코드'].astype(object).value_counts(), fill_value=0).reindex(codes)
+        if (counts >= need).all():
+            break
+    return context
+
+def _risk_levels_for_new_rows(dataset, new_rows):
+    """기존 데이터의 종목별 직전 행을 이어 붙여, 새 행의 '위험도'만 전체 재계산과 같은 결과로 구합니다."""
+    col_c1, col_c2 = RISK_COLUMNS
+    context = _risk_context_rows(dataset, new_rows['거래소코드'].dropna(), RISK_WINDOW - 1)
+    context = [rows[['거래소코드', '회계년도', col_c1, col_c2]].astype({'거래소코드': object}) for rows in context]
+    new_part = new_rows[['거래소코드', '회계년도', col_c1, col_c2]].assign(_new_row=np.arange(len(new_rows)))
+    combined = pd.concat(context + [new_part], ignore_index=True)
+    combined = combined.sort_values(by=['거래소코드', '회계년도'], ascending=True, ignore_index=True)
+    levels = compute_risk_levels(
+        combined['거래소코드'].to_numpy(dtype=object, na_value=None),
+        combined[col_c1].to_numpy(dtype=float, na_value=np.nan),
+        combined[col_c2].to_numpy(dtype=float, na_value=np.nan),
+        window=RISK_WINDOW,
+    )
+    is_new = combined['_new_row'].notna().to_numpy()
+    result = np.zeros(len(new_rows), dtype=np.int64)
+    result[combined.loc[is_new, '_new_row'].to_numpy(dtype=np.int64)] = levels[is_new]
+    return result
+
+def ingest_fiscal_year(new_rows, workbook_path=None, artifacts_dir=None):
+    """
+    새 회계년도 행(엑셀 경로 또는 원본과 같은 컬럼의 DataFrame)을 현재 아티팩트에 추가한 새 버전을 만들고, 그 manifest를 반환합니다.
+    - 숫자형 변환/필터링/위험도는 새 행에만 적용합니다. (기존 행의 위험도는 바뀌지 않음)
+    - 기존 데이터에 있는 선택 컬럼(초과수익률_apply 등)이 새 파일에 없으면 새 행은 결측값으로 채웁니다.
+    - VOL_QUARTILE_MODE가 "per_year"이면 새 연도의 분위만 계산하고, 백테스팅도 새 연도만 계산해 기존 결과에 더합니다.
+      "pooled"이면 전체 분위 경계가 바뀌므로 분위와 백테스팅을 전체에 대해 다시 계산합니다.
+    추가된 연도는 manifest의 지문(increments)에 기록되어 버전 ID에 반영되고(예: '3f2a9c1d04be-p5+2023'),
+    엑셀 자체가 교체되면 엑셀 기준으로 다시 만들어집니다. (교체된 엑셀에 추가 연도가 포함되어 있어야 함)
+    실행 중인 앱은 CURRENT 파일이 바뀐 것을 감지해 새 버전으로 교체합니다.
+    """
+    path = Path(workbook_path) if workbook_path else STOCK_DATASET_PATH
+    artifacts_dir = Path(artifacts_dir) if artifacts_dir else artifacts_dir_for(path)
+    started = time.perf_counter()
+    timings = {}
+    if not isinstance(new_rows, pd.DataFrame):
+        new_rows = pd.read_excel(new_rows, dtype={'거래소코드': str})
+    missing_cols = [col for col in REQUIRED_STOCK_COLUMNS if col not in new_rows.columns]
+    if missing_cols:
+        raise DatasetError(f"새 회계년도 데이터에 다음 필수 컬럼이 누락되었습니다: {', '.join(missing_cols)}")
+
+    with _build_lock(artifacts_dir):
+        manifest, fingerprint = check_current_artifact(path, artifacts_dir)
+        if manifest is None:
+            raise DatasetError("현재 아티팩트가 엑셀과 맞지 않습니다. 먼저 build를 실행해주세요.")
+        store = open_artifact(artifacts_dir, manifest)
+        current = store.query()
+        try:
+            df_new = _clean_stock_rows(new_rows.copy(), path)
+        except EmptyDatasetError:
+            raise EmptyDatasetError("추가할 2017년 이후의 유효한 행이 없습니다.") from None
+        new_years = sorted(int(year) for year in df_new['회계년도'].unique())
+        if new_years[0] <= current.latest_year:
+            raise DatasetError(f"{current.latest_year + 1}년 이후의 회계년도만 추가할 수 있습니다. (입력: {new_years})")
+        timings['ingest'] = time.perf_counter() - started
+
+        step = time.perf_counter()
+        df_new['위험도'] = _risk_levels_for_new_rows(current, df_new)
+        df_new['위험도_라벨'] = df_new['위험도'].map(RISK_LABELS)
+        timings['risk_levels'] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        history = current.frame
+        # 기존 데이터에 있는 선택 컬럼이 새 파일에 없으면 결측값으로 채우고, 그 밖의 컬럼이 없으면 오류로 알립니다.
+        missing_cols = [col for col in history.columns if col != 'vol_quartile' and col not in df_new.columns]
+        unfillable = [col for col in missing_cols if col not in OPTIONAL_STOCK_COLUMNS]
+        if unfillable:
+            raise DatasetError(f"새 회계년도 데이터에 기존 데이터의 다음 컬럼이 누락되었습니다: {', '.join(unfillable)}")
+        if missing_cols:
+            logger.warning("새 회계년도 데이터에 선택 컬럼 %s이(가) 없어 결측값으로 채웁니다.", ", ".join(missing_cols))
+            df_new = df_new.reindex(columns=[*df_new.columns, *missing_cols])
+        edges = dict((current.vol_quartile_edges or {}).get('edges', {}))
+        per_year = VOL_QUARTILE_MODE == "per_year"
+        if per_year:
+            df_new = add_volatility_quartiles(df_new, mode="per_year")
+            edges.update(df_new.attrs['vol_quartile_edges']['edges'])
+            combined = pd.concat([history, df_new[history.columns]], ignore_index=True)
+            combined.attrs['vol_quartile_edges'] = {'mode': "per_year", 'edges': edges}
+        else:
+            combined = pd.concat([history.drop(columns=['vol_quartile']), df_new[history.columns.drop('vol_quartile')]], ignore_index=True)
+            combined = add_volatility_quartiles(combined, mode="pooled")[history.columns]
+        timings['vol_quartiles'] = time.perf_counter() - step
+
+        step = time.perf_counter()
+        combined = combined.sort_values(by=['회계년도', '거래소코드'], kind='mergesort', ignore_index=True)
+        combined = apply_dtype_plan(combined)
+        timings['finalize'] = time.perf_counter() - step
+
+        # 연도별 분위에서는 이전 연도 결과가 바뀌지 않으므로 저장된 백테스팅 결과에 새 연도만 더합니다.
+        base = load_backtest_artifact(store.version, store.frame(BACKTEST_COLUMNS)) if per_year else None
+        fingerprint["increments"] = fingerprint.get("increments", []) + [
+            {'year': year, 'rows': int((df_new['회계년도'] == year).sum())} for year in new_years
+        ]
+        new_manifest = _write_artifact(
+            artifacts_dir, combined, fingerprint, timings, source_path=path, input_rows=len(new_rows),
+            started=started, backtest_base=base, parent_version=manifest['version'],
+        )
+        publish_artifact(artifacts_dir, new_manifest['version'])
+    return new_manifest
+
+
+# --- 명령줄 실행 ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="종목 데이터 전처리 아티팩트를 만듭니다.")
+    parser.add_argument("--input", default=str(STOCK_DATASET_PATH), help="원본 엑셀 경로 (기본값: data/stock_dataset.xlsx)")
+    parser.add_argument("--artifacts", help="아티팩트 디렉터리 (기본값: 엑셀 폴더의 artifacts/<엑셀 이름>)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="엑셀이 바뀌었으면 전체 파이프라인을 실행해 새 버전을 만듭니다.")
+    build.add_argument("--force", action="store_true", help="엑셀이 그대로여도 다시 생성")
+    ingest = commands.add_parser("ingest", help="새 회계년도 행만 처리해 현재 버전에 추가합니다.")
+    ingest.add_argument("new_rows", help="새 회계년도 엑셀 파일")
+    commands.add_parser("show", help="현재 아티팩트의 manifest를 출력합니다.")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    path = Path(args.input)
+    artifacts_dir = Path(args.artifacts) if args.artifacts else artifacts_dir_for(path)
+    try:
+        if args.command == "build":
+            if args.force:
+                manifest = build_artifacts(path, artifacts_dir)
+            else:
+                manifest = ensure_current_artifact(path, artifacts_dir)
+        elif args.command == "ingest":
+            manifest = ingest_fiscal_year(args.new_rows, path, artifacts_dir)
+        else:
+            manifest = read_current_manifest(artifacts_dir)
+            if manifest is None:
+                raise DatasetError(f"'{artifacts_dir}'에 현재 아티팩트가 없습니다.")
+    except FileNotFoundError as e:
+        print(f"⚠️ 파일을 찾을 수 없습니다: {e.filename or e}", file=sys.stderr)
+        return 1
+    except DatasetError as e:
+        print(f"⚠️ {e}", file=sys.stderr)
+        return 1
+    print(json.dumps({key: value for key, value in manifest.items() if key != 'columns'}, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
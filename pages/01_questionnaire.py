@@ -1,5 +1,5 @@
 import streamlit as st
-from utils import questions, calculate_score, validate_answers, show_footer, reset_survey_state
+from survey import questions, calculate_score, validate_answers, show_footer, reset_survey_state
 
 # --- 페이지 기본 설정 ---
 st.set_page_config(
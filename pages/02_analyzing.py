@@ -4,7 +4,16 @@ import streamlit as st
 import time
 import base64
 from pathlib import Path
-# from utils import check_session_timeout # check_session_timeout 제거로 불필요
+
+# 분석 연출 시간 (초). 화면 애니메이션은 브라우저(CSS)에서 재생되고, 서버는 이 시간이 지났는지만 확인합니다.
+ANALYSIS_SECONDS = 3.0
+ANALYSIS_STEPS = [
+    "연령대 및 투자 기간 분석",
+    "투자 경험 및 지식 수준 평가",
+    "금융 자산 및 소득 구조 확인",
+    "위험 감수 성향 측정",
+    "최종 투자 유형 분류",
+]
 
 # --- 페이지 설정 ---
 st.set_page_config(
@@ -62,6 +71,37 @@ st.markdown("""
         div[data-testid="stAlert"] {
             color: initial; 
         }
+
+        /* 진행률 막대와 단계 표시 (서버 대기 없이 브라우저에서 재생) */
+        @keyframes progressFill {
+            from { width: 0%; }
+            to { width: 100%; }
+        }
+        @keyframes stepAppear {
+            from { opacity: 0; transform: translateY(6px); }
+            to { opacity: 1; transform: translateY(0); }
+        }
+        .analysis-progress {
+            height: 14px;
+            border-radius: 7px;
+            background-color: #dbe9f5;
+            overflow: hidden;
+        }
+        .analysis-progress-fill {
+            height: 100%;
+            width: 100%;
+            background-color: #005A9C;
+            animation: progressFill var(--analysis-duration) linear forwards;
+        }
+        .analysis-step {
+            opacity: 0;
+            margin-top: 10px;
+            padding: 10px 14px;
+            border-radius: 8px;
+            background-color: #e7f5ff;
+            color: #005A9C;
+            animation: stepAppear 0.4s ease-out forwards;
+        }
     </style>
     """, unsafe_allow_html=True)
 
@@ -88,6 +128,11 @@ def get_image_as_base64(file_path):
 
 # --- 메인 로직 ---
 def analyzing_page():
+    # 설문이 끝났으므로 대시보드에서 쓸 데이터셋/백테스팅 결과를 미리 준비해 둡니다. (백그라운드)
+    # 데이터 모듈은 여기서 처음 필요하므로 이때 import합니다. (보통 로그인 때 백그라운드에서 이미 로드됨)
+    from utils import start_backtest_warmup
+    start_backtest_warmup()
+
     image_path = Path(__file__).parent.parent / "assets/brain_icon.png"
     image_base64 = get_image_as_base64(image_path)
     
@@ -125,28 +170,29 @@ def analyzing_page():
 
         st.markdown("<br>", unsafe_allow_html=True)
 
-        progress_bar = st.progress(0, text="분석 시작... 0%")
-        status_placeholder = st.empty()
-
-    analysis_steps = [
-        ("연령대 및 투자 기간 분석", 15),
-        ("투자 경험 및 지식 수준 평가", 40),
-        ("금융 자산 및 소득 구조 확인", 65),
-        ("위험 감수 성향 측정", 90),
-        ("최종 투자 유형 분류", 100),
-    ]
+        step_interval = ANALYSIS_SECONDS / (len(ANALYSIS_STEPS) + 1)
+        steps_html = "".join(
+            f'<div class="analysis-step" style="animation-delay: {i * step_interval:.2f}s;">⚙️ <b>진행 단계:</b> {step}...</div>'
+            for i, step in enumerate(ANALYSIS_STEPS, start=1)
+        )
+        st.markdown(f"""
+        <div style="--analysis-duration: {ANALYSIS_SECONDS}s;">
+            <div class="analysis-progress"><div class="analysis-progress-fill"></div></div>
+            {steps_html}
+        </div>
+        """, unsafe_allow_html=True)
 
-    for step_text, percentage in analysis_steps:
-        time.sleep(1)
-        status_placeholder.info(f"⚙️ **진행 단계:** {step_text}...")
-        progress_bar.progress(percentage, text=f"분석 진행률... {percentage}%")
+    wait_for_analysis()
 
-    time.sleep(0.5)
-    status_placeholder.success("✅ 분석이 완료되었습니다! 잠시 후 결과 페이지로 이동합니다.")
-    progress_bar.progress(100, text="분석 완료! 100%")
-    time.sleep(1.5)
 
-    st.switch_page("pages/03_result.py")
+# --- 연출 시간이 지나면 결과 페이지로 이동 ---
+# 서버 스레드를 time.sleep으로 잡아두지 않고, 브라우저가 0.5초마다 이 조각(fragment)만 다시 실행합니다.
+@st.fragment(run_every=0.5)
+def wait_for_analysis():
+    started_at = st.session_state.setdefault('analysis_started_at', time.time())
+    if time.time() - started_at >= ANALYSIS_SECONDS:
+        del st.session_state.analysis_started_at
+        st.switch_page("pages/03_result.py")
 
 
 if __name__ == "__main__":
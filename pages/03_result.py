@@ -1,10 +1,7 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from datetime import datetime
 
-from utils import questions, calculate_score, classify_investment_type, show_footer, reset_survey_state
+from survey import questions, calculate_score, classify_investment_type, show_footer, reset_survey_state
 
 # --- 페이지 설정 ---
 st.set_page_config(
@@ -73,6 +70,10 @@ if 'kyc_acknowledged_for_session' not in st.session_state:
 
 # 결과 페이지 메인 함수
 def result_page():
+    # 차트를 그릴 때만 필요한 무거운 모듈은 여기서 불러옵니다. (로그인 확인에서 멈추는 실행은 pandas/plotly를 로드하지 않음)
+    import pandas as pd
+    import plotly.express as px
+
     st.title("🎯 투자성향 진단 결과")
     st.markdown("---")
 
@@ -1,12 +1,15 @@
 import streamlit as st
 import pandas as pd
+import logging
 import plotly.express as px
 import plotly.graph_objects as go
-import time
 import numpy as np 
 # classify_investment_type을 import할 필요가 없습니다. (utils.py의 classify_investment_type은 점수를 인자로 받으므로)
 # 대신, utils.py의 classify_investment_type이 반환하는 색상 매핑을 여기에 직접 정의하여 사용합니다.
-from utils import load_and_process_data, reset_survey_state 
+from survey import reset_survey_state
+from utils import BACKTEST_COLUMNS, get_session_dataset, start_backtest_warmup
+
+logger = logging.getLogger(__name__)
 
 # 페이지 설정
 st.set_page_config(page_title="추천 펀드", page_icon="💰", layout="wide")
@@ -243,135 +246,6 @@ def create_backtest_results_chart(backtest_results, investment_type): # investme
     
     return fig
 
-# --- 백테스팅 로직을 포함하는 추천 종목 및 연도별 CAGR 계산 함수 ---
-@st.cache_data(ttl=3600) # 데이터 처리 결과를 캐싱하여 성능 향상 (1시간 TTL)
-def get_backtested_results_and_latest_recommendations(df_full_cached, investment_type_cached):
-    """
-    각 연도별, 각 조건 그룹별 상위 10개 종목을 찾고, 그들의 평균 CAGR을 계산합니다.
-    또한, 특정 investment_type에 해당하는 최신 연도의 추천 종목 목록을 반환합니다.
-    recommended_stocks는 이제 각 종목의 회사명과 CAGR을 포함하는 딕셔너리 리스트입니다.
-
-    반환:
-        - results_all_conditions (dict): {f"{year} - {label}": {'mean_cagr': float, 'recommended_stocks': list of dicts}} 형태
-        - latest_recommendations_for_type (pd.DataFrame): 사용자의 investment_type에 맞는 최신 연도 추천 종목
-    """
-    df_full = df_full_cached.copy()
-
-    # investment_type (한글 유형명)에 따라 사용할 '조건 그룹'을 매핑
-    # 이 맵은 get_backtested_results_and_latest_recommendations 함수 내부에서
-    # 'selected_group_label'을 결정하고, 'latest_recommendations_for_type'을 필터링하는 데 사용됩니다.
-    investment_group_map = {
-        '안정추구형': 'Class 0 (Q1)',
-        '위험중립형': 'Class 1 (Q1~Q2)',
-        '적극투자형': 'Class 2 (Q1~Q3)',
-        '공격투자형': 'Class 3 (Q1~Q4)',
-        # '안정형'은 이 대시보드 페이지에 오지 않으므로 여기에 매핑하지 않습니다.
-    }
-    
-    if '회계년도' not in df_full.columns:
-        st.error("⚠️ 데이터에 '회계년도' 컬럼이 없습니다. 데이터 구조를 확인해주세요.")
-        return {}, pd.DataFrame(columns=['회사명', '거래소코드', 'CAGR', '연간변동성', 'target_class'])
-
-    df_full['회계년도'] = pd.to_numeric(df_full['회계년도'], errors='coerce').astype('Int64')
-    df_full.dropna(subset=['회계년도'], inplace=True) 
-
-    all_years = sorted(df_full['회계년도'].unique().tolist())
-    if not all_years:
-        st.warning("⚠️ '회계년도' 데이터가 유효하지 않아 백테스팅을 수행할 수 없습니다.")
-        return {}, pd.DataFrame(columns=['회사명', '거래소코드', 'CAGR', '연간변동성', 'target_class'])
-
-    latest_year = all_years[-1]
-
-    results_all_conditions = {} 
-    latest_recommendations_for_type = pd.DataFrame(columns=['회사명', '거래소코드', 'CAGR', '연간변동성', 'target_class']) 
-
-    company_name_col = None
-    possible_company_cols = ['회사명', '종목명', '회사', '종목', 'Company', 'Name']
-    for col in possible_company_cols:
-        if col in df_full.columns:
-            company_name_col = col
-            break
-    
-    if company_name_col is None:
-        st.error("⚠️ 회사명을 나타내는 컬럼을 찾을 수 없습니다. 가능한 컬럼명: " + ", ".join(possible_company_cols))
-        return {}, pd.DataFrame(columns=['회사명', '거래소코드', 'CAGR', '연간변동성', 'target_class'])
-
-
-    conditions_definitions = {
-        'Class 0 (Q1)': (lambda df_y: (df_y['target_class'] == 0) & (df_y['vol_quartile'] == 1)),
-        'Class 1 (Q1~Q2)': (lambda df_y: (df_y['target_class'].isin([0, 1])) & (df_y['vol_quartile'].isin([1, 2]))),
-        'Class 2 (Q1~Q3)': (lambda df_y: (df_y['target_class'].isin([0, 1, 2])) & (df_y['vol_quartile'].isin([1, 2, 3]))),
-        'Class 3 (Q1~Q4)': (lambda df_y: (df_y['target_class'].isin([0, 1, 2, 3])) & (df_y['vol_quartile'].isin([1, 2, 3, 4]))),
-    }
-
-    for year in all_years:
-        df_year = df_full[df_full['회계년도'] == year].copy()
-
-        required_cols_for_processing = ['target_class', 'vol_quartile', 'CAGR', '거래소코드', '연간변동성'] 
-        if company_name_col:
-            required_cols_for_processing.append(company_name_col)
-
-        # 필수 컬럼이 하나라도 누락된 연도는 건너뛰고 빈 결과로 채움
-        if not all(col in df_year.columns for col in required_cols_for_processing):
-            for label in conditions_definitions.keys():
-                key = f"{year} - {label}"
-                results_all_conditions[key] = {'mean_cagr': 0.0, 'recommended_stocks': []} 
-            continue 
-
-        for label, condition_func in conditions_definitions.items():
-            key = f"{year} - {label}"
-            
-            condition_mask = condition_func(df_year)
-            filtered_df = df_year[condition_mask]
-            
-            mean_cagr = 0.0
-            top10_stocks_details = [] 
-            current_top10_cagr_df = pd.DataFrame(columns=['회사명', '거래소코드', 'CAGR', '연간변동성', 'target_class']) 
-
-            if not filtered_df.empty:
-                filtered_df.loc[:, 'CAGR'] = pd.to_numeric(filtered_df['CAGR'], errors='coerce')
-                
-                # '회사명'과 'CAGR' 컬럼이 모두 존재하며 유효한 데이터가 있는 경우만 처리
-                if company_name_col in filtered_df.columns and 'CAGR' in filtered_df.columns and not filtered_df.dropna(subset=[company_name_col, 'CAGR']).empty:
-                    current_top10_cagr_df = filtered_df.sort_values(by='CAGR', ascending=False, na_position='last').head(10)
-                    
-                    mean_cagr = current_top10_cagr_df['CAGR'].mean()
-                    if pd.isna(mean_cagr):
-                        mean_cagr = 0.0
-                    
-                    # 회사명과 CAGR을 포함하는 딕셔너리 리스트 생성
-                    # 회사명 컬럼 이름을 '회사명'으로 통일하여 to_dict에 전달
-                    temp_df_for_details_conversion = current_top10_cagr_df[[company_name_col, 'CAGR']].copy()
-                    if company_name_col != '회사명':
-                        temp_df_for_details_conversion.rename(columns={company_name_col: '회사명'}, inplace=True)
-                    
-                    # NaN 값이 있는 행은 드롭하여 깨끗한 데이터만 남김 (회사명, CAGR 둘 다 유효한 경우)
-                    top10_stocks_details = temp_df_for_details_conversion.dropna(subset=['회사명', 'CAGR']).to_dict(orient='records')
-                else: # 회사명이나 CAGR 컬럼이 없거나, 유효한 데이터가 하나도 없는 경우
-                    top10_stocks_details = []
-                    mean_cagr = 0.0 # 계산 불가
-            
-            results_all_conditions[key] = {
-                'mean_cagr': mean_cagr,
-                'recommended_stocks': top10_stocks_details 
-            }
-
-            # 최신 연도 추천 종목을 저장하는 부분은 이미 잘 되어있었음
-            # 이 부분에서 investment_type_cached는 classify_investment_type이 반환하는 실제 유형명입니다.
-            # 이 유형명이 investment_group_map에 정의된 Class X (QY) 라벨로 변환되어 비교됩니다.
-            if year == latest_year and label == investment_group_map.get(investment_type_cached):
-                cols_for_latest_rec = ['회사명', '거래소코드', 'CAGR', '연간변동성', 'target_class']
-                # current_top10_cagr_df가 비어있을 수 있으므로 빈 DataFrame으로 기본값 설정
-                if current_top10_cagr_df.empty:
-                    latest_recommendations_for_type = pd.DataFrame(columns=cols_for_latest_rec)
-                else:
-                    latest_recommendations_for_type = current_top10_cagr_df[[col for col in cols_for_latest_rec if col in current_top10_cagr_df.columns]].copy()
-                    if company_name_col != '회사명' and company_name_col in latest_recommendations_for_type.columns:
-                        latest_recommendations_for_type.rename(columns={company_name_col: '회사명'}, inplace=True)
-    
-    return results_all_conditions, latest_recommendations_for_type
-
-
 # --- 벤치마크 꺾은선 그래프 표현 함수 (수정 없음) ---
 # df_recommended_yearly_cagr은 사용자의 투자성향에 맞는 데이터만 포함한 DataFrame입니다.
 def create_benchmark_chart(df_recommended_yearly_cagr, investment_type): 
@@ -486,27 +360,23 @@ st.markdown(f"### 🎉 회원님의 투자성향은 **<span style='color: {curre
 st.write(f"아래는 **{retrieved_investment_type}** 투자 성향에 맞춰 백테스팅된 펀드형 추천 포트폴리오의 결과입니다.")
 st.markdown("---")
 
-# 데이터 로드
-df_full = load_and_process_data()
+# 데이터 로드 (모든 세션이 공유하는 읽기 전용 데이터셋, 이 세션이 시작한 버전에 고정됨)
+# 대시보드는 전체 연도가 필요하지만 컬럼은 백테스팅에 쓰는 것만 읽습니다.
+dataset = get_session_dataset(columns=BACKTEST_COLUMNS)
+df_full = dataset.frame
 
 if df_full.empty:
     st.warning("데이터 로드에 실패했거나 처리할 종목이 없습니다.")
     st.stop()
 
-if '연간변동성' in df_full.columns:
-    df_full['연간변동성'] = pd.to_numeric(df_full['연간변동성'], errors='coerce')
-    df_full.dropna(subset=['연간변동성'], inplace=True)
-    
-    if not df_full['연간변동성'].empty and df_full['연간변동성'].nunique() >= 4:
-        df_full['vol_quartile'] = pd.qcut(df_full['연간변동성'], q=4, labels=[1, 2, 3, 4], duplicates='drop')
-        df_full['vol_quartile'] = df_full['vol_quartile'].astype(int)
-    else:
-        st.warning("⚠️ '연간변동성' 데이터가 충분하지 않아 분위수(vol_quartile)를 계산할 수 없습니다. 분석이 제한될 수 있습니다.")
-        df_full['vol_quartile'] = 1 
-else:
+if '연간변동성' not in df_full.columns or 'vol_quartile' not in df_full.columns:
     st.error("⚠️ 데이터에 '연간변동성' 컬럼이 없습니다. 데이터 구조를 확인해주세요.")
     st.stop()
 
+vol_quartile_edges = (dataset.vol_quartile_edges or {}).get('edges', {})
+if any(edges is None for edges in vol_quartile_edges.values()):
+    st.warning("⚠️ '연간변동성' 데이터가 충분하지 않아 분위수(vol_quartile)를 계산할 수 없습니다. 분석이 제한될 수 있습니다.")
+
 if 'target_class' not in df_full.columns:
     st.error("⚠️ 데이터에 'target_class' 컬럼이 없습니다. 데이터 구조를 확인해주세요.")
     st.stop()
@@ -516,7 +386,42 @@ if 'target_class' not in df_full.columns:
 if 'animation_stage' not in st.session_state:
     st.session_state.animation_stage = 'initial'  
 
+# --- 백테스팅 결과 준비 대기 (애니메이션 단계) ---
+# 브라우저가 0.3초마다 이 조각(fragment)만 다시 실행하며 백그라운드 작업이 끝났는지 확인합니다.
+@st.fragment(run_every=0.3)
+def wait_for_backtest(warmup_future):
+    if not warmup_future.done():
+        return
+
+    # 백테스팅 결과는 데이터셋 버전별로 모든 투자성향에 대해 한 번만 계산되어 공유됩니다. (utils.BacktestStore)
+    # 안내 문구는 바로 이어지는 앱 재실행에 지워지지 않도록 session_state에 남겨 두고 아래 단계별 화면에서 보여줍니다.
+    if 'backtest_results_all_conditions' not in st.session_state or 'recommended_fund_stocks_latest' not in st.session_state:
+        error = warmup_future.exception()
+        if error is not None:
+            logger.error("백테스팅 준비 실패 (데이터셋 버전 %s)", dataset.version, exc_info=error)
+            st.session_state.backtest_notice = ('error', "⚠️ 백테스팅 결과를 준비하지 못했습니다. 잠시 후 다시 시도해주세요.")
+            st.session_state.animation_stage = 'initial' # 다시 누르면 실패한 작업만 새로 제출됨 (utils.submit_background)
+            st.rerun(scope="app")
+        backtest_store = warmup_future.result()
+        if backtest_store.empty:
+            st.session_state.backtest_notice = ('warning', "⚠️ '회계년도' 데이터가 유효하지 않아 백테스팅을 수행할 수 없습니다.")
+        st.session_state.backtest_results_all_conditions, st.session_state.recommended_fund_stocks_latest = \
+            backtest_store.view(retrieved_investment_type)
+
+    st.balloons()
+    st.session_state.animation_stage = 'completed'
+    st.rerun(scope="app")
+
+
 # 단계별 처리
+backtest_notice = st.session_state.get('backtest_notice')
+if backtest_notice is not None:
+    level, message = backtest_notice
+    if level == 'error':
+        st.error(message)
+    else:
+        st.warning(message)
+
 if st.session_state.animation_stage == 'initial':
     st.markdown("<div class='fade-in'>", unsafe_allow_html=True)
     st.markdown("<h3 style='text-align: center;'>✨ 지금 바로 회원님께 맞는 추천 펀드를 확인하세요! ✨</h3>", unsafe_allow_html=True)
@@ -528,6 +433,7 @@ if st.session_state.animation_stage == 'initial':
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         if st.button("🎁 추천 펀드 공개하기", type="primary", use_container_width=True):
+            st.session_state.pop('backtest_notice', None)
             st.session_state.animation_stage = 'animating'
             st.rerun()
     st.markdown("</div>", unsafe_allow_html=True)
@@ -550,16 +456,9 @@ elif st.session_state.animation_stage == 'animating':
     """, unsafe_allow_html=True)
     st.markdown("</div>", unsafe_allow_html=True)
     
-    # investment_type_cached 인자에 st.session_state에서 가져온 retrieved_investment_type을 전달합니다.
-    if 'backtest_results_all_conditions' not in st.session_state or 'recommended_fund_stocks_latest' not in st.session_state:
-        st.session_state.backtest_results_all_conditions, st.session_state.recommended_fund_stocks_latest = \
-            get_backtested_results_and_latest_recommendations(df_full, retrieved_investment_type) 
-    
-    time.sleep(2.5)
-    st.balloons()
-    
-    st.session_state.animation_stage = 'completed'
-    st.rerun()
+    # 백테스팅은 설문 직후부터 백그라운드에서 준비되고 있습니다. (utils.start_backtest_warmup)
+    # 서버 스레드를 time.sleep으로 잡아두지 않고, 결과가 준비되는 즉시 애니메이션을 끝냅니다.
+    wait_for_backtest(start_backtest_warmup(dataset))
 
 else:  # animation_stage == 'completed'
     st.markdown("<div class='slide-up'>", unsafe_allow_html=True)
@@ -567,7 +466,7 @@ else:  # animation_stage == 'completed'
     backtest_results_all_conditions = st.session_state.get('backtest_results_all_conditions', {})
     recommended_df_latest_year = st.session_state.get('recommended_fund_stocks_latest', pd.DataFrame())
 
-    # investment_group_map 정의 (create_backtest_results_chart와 get_backtested_results_and_latest_recommendations에 전달될 것)
+    # investment_group_map 정의 (create_backtest_results_chart와 같은 매핑, 안정형 포함)
     # 이 맵은 Class 0 (Q1) 등 내부적인 라벨과 한글 투자성향 이름을 연결합니다.
     investment_group_map = {
         '안정형': 'Class 0 (Q1)', # 안정형은 이 대시보드에 오지 않지만, 혹시 모를 상황 대비 포함
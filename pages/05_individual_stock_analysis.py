@@ -3,7 +3,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from utils import load_and_process_data, reset_survey_state
+from survey import reset_survey_state
+from utils import get_session_dataset
+
+# 이 페이지가 사용하는 컬럼 (없는 컬럼은 로드 시 무시됨)
+STOCK_PAGE_COLUMNS = ['회사명', '거래소코드', 'CAGR', '연간변동성', '초과수익률_apply', 'target_class']
+
+# 종목 표는 현재 페이지의 행만 브라우저로 보냅니다.
+STOCK_TABLE_PAGE_SIZES = [25, 50, 100, 200]
+STOCK_TABLE_DEFAULT_PAGE_SIZE = 50
 
 # 페이지 설정
 st.set_page_config(page_title="종목 대시보드", page_icon="📈", layout="wide")
@@ -45,177 +53,238 @@ st.markdown("자유롭게 종목을 필터링하고 선택하여 나만의 포
 # 세션 상태 변수 초기화 (이 페이지에서 필요한 것들)
 if 'show_results' not in st.session_state: st.session_state.show_results = False
 if 'portfolio_results' not in st.session_state: st.session_state.portfolio_results = pd.DataFrame()
-# '포트폴리오 선택'은 04_dashboard.py에서 초기화될 수 있으므로, 없으면 빈 리스트로 초기화
-if '포트폴리오 선택' not in st.session_state: st.session_state['포트폴리오 선택'] = []
+# '포트폴리오 선택'은 선택한 종목의 거래소코드 집합입니다. (표의 페이지를 넘겨도 유지)
+if '포트폴리오 선택' not in st.session_state: st.session_state['포트폴리오 선택'] = set()
 
 
-# 데이터 로드 및 전처리
-df_full = load_and_process_data()
+# 데이터 로드 (모든 세션이 공유하는 읽기 전용 데이터셋 — 복사하지 않고 필터링 결과만 새로 만듭니다)
+# 이 페이지의 표/검색/포트폴리오 분석에 쓰는 컬럼만 읽습니다.
+dataset = get_session_dataset(columns=STOCK_PAGE_COLUMNS)
+df_full = dataset.frame
 
 if df_full.empty:
     st.info("데이터 로드에 실패했거나 처리할 종목이 없습니다.")
     st.stop()
 
-# --- 필터, 정렬 및 검색 옵션 Expander ---
-with st.expander("🔍 필터, 정렬 및 검색 옵션", expanded=True):
-    col_filter, col_sort1, col_sort2 = st.columns(3)
+# --- 화면 구성: 필터 / 종목 표·선택 / 포트폴리오 분석을 각각 조각(fragment)으로 나눕니다. ---
+# 위젯을 조작하면 그 위젯이 속한 조각만 다시 실행되므로, 체크박스나 페이지를 바꿔도 CSS·데이터 로드·분석 결과 차트는 다시 만들지 않습니다.
+# 표 조각은 필터 조각 안에서 호출되어, 필터/정렬을 바꾸면 표도 함께 다시 그려집니다.
+# 표·상위 5개 선택·포트폴리오 분석은 모두 회사별 한 행(기준 연도 이하 가장 최근 회계년도)만 담은 스냅샷(dataset.snapshot)을 사용합니다.
+
+@st.fragment
+def stock_filter_section(dataset):
+    """필터·정렬·기준 연도 옵션. 선택한 조합의 스냅샷 행 위치를 계산해 표 조각에 넘깁니다."""
+    # --- 필터, 정렬 및 검색 옵션 Expander ---
+    with st.expander("🔍 필터, 정렬 및 검색 옵션", expanded=True):
+        col_year, col_filter, col_sort1, col_sort2 = st.columns(4)
+
+        with col_year:
+            # 회사마다 기준 연도 이하에서 가장 최근 회계년도의 행 하나만 보여줍니다. (기본값: 최신)
+            as_of_year = st.selectbox("기준 연도", options=[None] + dataset.years[::-1],
+                                      format_func=lambda year: "최신 (회사별 최근 연도)" if year is None else f"{year}년",
+                                      key='stock_as_of_year')
+        snapshot = dataset.snapshot(as_of_year)
+        df_snapshot = snapshot.frame
     
-    with col_filter:
-        # target_class를 기준으로 필터링
-        target_class_options_map = {
-            "전체 보기": [0,1,2,3],
-            "안정형 (target_class 0)": [0],
-            "위험중립형 (target_class 1)": [1],
-            "적극투자형 (target_class 2)": [2],
-            "공격투자형 (target_class 3)": [3]
-        }
-        selected_target_class_label = st.selectbox("투자성향 분류 필터", 
-                                                options=list(target_class_options_map.keys()),
-                                                index=0) # 기본값: '전체 보기'
+        with col_filter:
+            # target_class를 기준으로 필터링
+            target_class_options_map = {
+                "전체 보기": [0,1,2,3],
+                "안정형 (target_class 0)": [0],
+                "위험중립형 (target_class 1)": [1],
+                "적극투자형 (target_class 2)": [2],
+                "공격투자형 (target_class 3)": [3]
+            }
+            selected_target_class_label = st.selectbox("투자성향 분류 필터", 
+                                                    options=list(target_class_options_map.keys()),
+                                                    index=0) # 기본값: '전체 보기'
     
-    selected_target_classes = target_class_options_map[selected_target_class_label]
-    filtered_df = df_full[df_full['target_class'].isin(selected_target_classes)].copy()
-
-    # 정렬 기준 옵션 추가 (배당수익률 제거)
-    sort_option_map = {'기본 (회사명 순)': '회사명'}
-    if '초과수익률_apply' in filtered_df.columns: sort_option_map['초과수익률'] = '초과수익률_apply'
-    if 'CAGR' in filtered_df.columns: sort_option_map['CAGR'] = 'CAGR'
-    if '연간변동성' in filtered_df.columns: sort_option_map['연간변동성'] = '연간변동성'
-
-    with col_sort1:
-        sort_by_label = st.selectbox("정렬 기준", options=list(sort_option_map.keys()))
-    sort_by_col = sort_option_map[sort_by_label]
-
-    with col_sort2:
-        # 기본 정렬 순서 설정 (수익률 등은 내림차순, 변동성 등은 오름차순)
-        is_desc_default = sort_by_col in ['초과수익률_apply', 'CAGR'] # 배당수익률 제거
-        is_asc_default = sort_by_col in ['연간변동성']
-
-        if is_desc_default:
-            default_index_sort = 1 # '내림차순'
-        elif is_asc_default:
-            default_index_sort = 0 # '오름차순'
-        else:
-            default_index_sort = 0 # 기타(회사명)는 '오름차순'
+        selected_target_classes = target_class_options_map[selected_target_class_label]
+
+        # 정렬 기준 옵션 추가 (배당수익률 제거)
+        sort_option_map = {'기본 (회사명 순)': '회사명'}
+        if '초과수익률_apply' in df_snapshot.columns: sort_option_map['초과수익률'] = '초과수익률_apply'
+        if 'CAGR' in df_snapshot.columns: sort_option_map['CAGR'] = 'CAGR'
+        if '연간변동성' in df_snapshot.columns: sort_option_map['연간변동성'] = '연간변동성'
+
+        with col_sort1:
+            sort_by_label = st.selectbox("정렬 기준", options=list(sort_option_map.keys()))
+        sort_by_col = sort_option_map[sort_by_label]
+
+        with col_sort2:
+            # 기본 정렬 순서 설정 (수익률 등은 내림차순, 변동성 등은 오름차순)
+            is_desc_default = sort_by_col in ['초과수익률_apply', 'CAGR'] # 배당수익률 제거
+            is_asc_default = sort_by_col in ['연간변동성']
+
+            if is_desc_default:
+                default_index_sort = 1 # '내림차순'
+            elif is_asc_default:
+                default_index_sort = 0 # '오름차순'
+            else:
+                default_index_sort = 0 # 기타(회사명)는 '오름차순'
         
-        ascending = st.radio("정렬 순서", ('오름차순', '내림차순'), 
-                             index=default_index_sort,
-                             horizontal=True, key='sort_order_general_stock_page') 
+            ascending = st.radio("정렬 순서", ('오름차순', '내림차순'), 
+                                 index=default_index_sort,
+                                 horizontal=True, key='sort_order_general_stock_page') 
     
-    is_ascending = (ascending == '오름차순')
-    filtered_df = filtered_df.sort_values(by=sort_by_col, ascending=is_ascending)
-
-st.markdown("---")
-st.subheader(f"필터링된 종목 리스트 ({len(filtered_df)}개)")
-
-# 검색 및 상위 5개/모두 해제 버튼
-col_search, col_btn1, col_btn2 = st.columns([2, 1, 1])
-with col_search:
-    search_query = st.text_input("종목명 검색", placeholder="종목명 일부를 입력하세요...", label_visibility="collapsed")
-
-if search_query:
-    df_to_display = filtered_df[filtered_df['회사명'].str.contains(search_query, case=False, na=False)]
-else:
-    df_to_display = filtered_df
-
-with col_btn1:
-    if st.button("✨ 상위 5개 추가 선택", use_container_width=True):
-        top_5_stocks = df_to_display.head(5)['회사명'].tolist()
-        # 기존 선택에 추가 (중복 방지)
-        st.session_state['포트폴리오 선택'] = list(set(st.session_state['포트폴리오 선택'] + top_5_stocks))
-        st.rerun()
-with col_btn2:
-    if st.button("🔄 선택 모두 해제", use_container_width=True):
-        st.session_state['포트폴리오 선택'] = []
-        st.rerun()
-
-st.info("💡 **'상위 5개 추가 선택' 버튼은 현재 보이는 리스트의 정렬 순서를 따르며, 기존 선택에 추가됩니다.**")
-
-if df_to_display.empty:
-    st.warning("표시할 종목이 없습니다. 필터 조건을 조정하거나 검색어를 확인해주세요.")
-else:
-    # 대시보드 테이블에 표시할 컬럼 정의 (배당수익률 제거)
-    cols_to_display_table = ['회사명', '거래소코드', 'CAGR', '연간변동성', '초과수익률_apply', 'target_class']
-    final_display_cols_table = [col for col in cols_to_display_table if col in df_to_display.columns]
-    
-    display_df = df_to_display[final_display_cols_table].copy()
-    display_df.insert(0, '선택', False)
-    display_df['선택'] = display_df['회사명'].isin(st.session_state['포트폴리오 선택'])
-
-    # 컬럼 이름 변경 (사용자에게 더 친숙하게) (배당수익률 제거)
-    display_df.columns = ['선택', '회사명', '거래소코드', 'CAGR (%)', '연간변동성 (%)', '초과수익률 (%)', '투자성향분류']
-
-    edited_df = st.data_editor(
-        display_df, 
-        column_config={"선택": st.column_config.CheckboxColumn(required=True)}, 
-        disabled=display_df.columns.drop('선택'), # '선택' 컬럼만 편집 가능하게 함
-        hide_index=True, 
-        use_container_width=True
-    )
-    # 사용자가 체크박스를 조작한 결과를 세션 상태에 반영
-    st.session_state['포트폴리오 선택'] = edited_df[edited_df['선택']]['회사명'].tolist()
-
-# 선택된 종목으로 포트폴리오 분석
-# df_full에서 선택된 종목의 전체 데이터를 가져옴 (필터링된 df_to_display가 아닌 원본에서)
-selected_stocks_df = df_full[df_full['회사명'].isin(st.session_state['포트폴리오 선택'])].copy()
-num_selected = len(selected_stocks_df)
-st.markdown("---")
-
-is_disabled = (num_selected == 0)
-if st.button('📈 포트폴리오 분석 실행', type='primary', use_container_width=True, disabled=is_disabled):
-    if '초과수익률_apply' in selected_stocks_df.columns:
-        st.session_state.portfolio_results = selected_stocks_df.copy()
-        st.session_state.show_results = True
+        is_ascending = (ascending == '오름차순')
+        # 버전별로 미리 계산한 정렬 순서에서 선택한 분류의 행만 골라냅니다. (isin/sort_values를 매번 하지 않음, 결측값은 항상 맨 뒤)
+        filtered_positions = snapshot.view_index.positions(selected_target_classes, sort_by_col, is_ascending)
+
+    stock_table_section(snapshot, filtered_positions, (as_of_year, selected_target_class_label, sort_by_col, is_ascending))
+
+@st.fragment
+def stock_table_section(snapshot, filtered_positions, view_key):
+    """검색·페이지 나누기·종목 표. 체크박스 변경은 이 조각만 다시 실행하며 선택 집합에 변경분만 반영합니다."""
+    df_snapshot = snapshot.frame
+    st.markdown("---")
+    st.subheader(f"필터링된 종목 리스트 ({len(filtered_positions)}개)")
+
+    # 검색 및 상위 5개/모두 해제 버튼
+    col_search, col_btn1, col_btn2 = st.columns([2, 1, 1])
+    with col_search:
+        search_query = st.text_input("종목명 검색", placeholder="종목명 일부 또는 초성(예: ㅅㅅㅈㅈ)을 입력하세요...", label_visibility="collapsed")
+
+    # 버전별로 한 번 만들어 둔 회사명 색인에서 일치하는 행만 남기고, 정렬 순서대로 필요한 행만 꺼냅니다.
+    search_mask = snapshot.search_index.row_mask(search_query)
+    if search_mask is not None:
+        filtered_positions = filtered_positions[search_mask.take(filtered_positions)]
+    total_rows = len(filtered_positions)
+
+    with col_btn1:
+        if st.button("✨ 상위 5개 추가 선택", use_container_width=True):
+            top_5_codes = df_snapshot.index[filtered_positions[:5]]
+            # 기존 선택에 추가 (중복 방지) — 아래 표는 같은 실행에서 바뀐 선택으로 그려집니다.
+            st.session_state['포트폴리오 선택'] |= set(top_5_codes)
+    with col_btn2:
+        if st.button("🔄 선택 모두 해제", use_container_width=True):
+            st.session_state['포트폴리오 선택'] = set()
+
+    st.info("💡 **'상위 5개 추가 선택' 버튼은 현재 보이는 리스트의 정렬 순서를 따르며, 기존 선택에 추가됩니다.**")
+
+    if total_rows == 0:
+        st.warning("표시할 종목이 없습니다. 필터 조건을 조정하거나 검색어를 확인해주세요.")
     else:
-        st.error("⚠️ 분석에 필요한 '초과수익률_apply' 컬럼이 데이터에 없습니다. 데이터셋을 확인해주세요.")
-        st.session_state.show_results = False
-    st.rerun()
-
-if num_selected == 0:
-    st.session_state.show_results = False
-    st.warning("**분석할 종목을 1개 이상 선택해주세요.**")
-
-st.markdown("---")
-st.header("📊 현재 선택된 포트폴리오 분석 결과")
-if st.session_state.show_results:
-    results_df = st.session_state.portfolio_results
-    if not results_df.empty:
-        benchmark_rate = 2.8 # 예시 국고채 금리
-        
-        # 포트폴리오의 총 초과수익률은 선택된 종목들의 평균 초과수익률로 계산
-        if '초과수익률_apply' in results_df.columns:
-            average_excess_return = results_df['초과수익률_apply'].mean()
+        # --- 페이지 나누기: 현재 페이지의 행만 잘라 표로 보냅니다. ---
+        col_page_size, col_page, col_page_info = st.columns([1, 1, 2])
+        with col_page_size:
+            page_size = st.selectbox("페이지당 행 수", STOCK_TABLE_PAGE_SIZES,
+                                     index=STOCK_TABLE_PAGE_SIZES.index(STOCK_TABLE_DEFAULT_PAGE_SIZE), key='stock_table_page_size')
+        num_pages = (total_rows - 1) // page_size + 1
+
+        # 필터/정렬/검색/페이지 크기가 바뀌면 첫 페이지로 돌아갑니다.
+        view_signature = (*view_key, search_query, page_size)
+        if st.session_state.get('stock_table_view') != view_signature:
+            st.session_state.stock_table_view = view_signature
+            st.session_state.stock_table_page = 1
+        st.session_state.stock_table_page = min(max(st.session_state.get('stock_table_page', 1), 1), num_pages)
+        with col_page:
+            page_number = st.number_input("페이지", min_value=1, max_value=num_pages, step=1, key='stock_table_page')
+
+        page_start = (page_number - 1) * page_size
+        page_end = min(page_start + page_size, total_rows)
+        with col_page_info:
+            st.caption(f"전체 {total_rows:,}개 중 {page_start + 1:,}–{page_end:,}번째 (페이지 {page_number}/{num_pages})")
+
+        # 대시보드 테이블에 표시할 컬럼 정의 (배당수익률 제거)
+        cols_to_display_table = ['회사명', '거래소코드', '회계년도', 'CAGR', '연간변동성', '초과수익률_apply', 'target_class']
+        final_display_cols_table = [col for col in cols_to_display_table if col in df_snapshot.columns]
+
+        display_df = df_snapshot[final_display_cols_table].take(filtered_positions[page_start:page_end])
+        page_codes = display_df.index.to_numpy()
+        display_df.insert(0, '선택', display_df.index.isin(st.session_state['포트폴리오 선택']))
+
+        # 컬럼 이름 변경 (사용자에게 더 친숙하게) (배당수익률 제거)
+        display_df.columns = ['선택', '회사명', '거래소코드', '회계년도', 'CAGR (%)', '연간변동성 (%)', '초과수익률 (%)', '투자성향분류']
+
+        edited_df = st.data_editor(
+            display_df, 
+            column_config={"선택": st.column_config.CheckboxColumn(required=True)}, 
+            disabled=display_df.columns.drop('선택'), # '선택' 컬럼만 편집 가능하게 함
+            hide_index=True, 
+            use_container_width=True
+        )
+        # 이 페이지에서 사용자가 바꾼 체크박스만 선택 집합(거래소코드)에 반영 — 다른 페이지에서 고른 종목은 그대로 유지됩니다.
+        toggled = (edited_df['선택'] != display_df['선택']).to_numpy()
+        checked = edited_df['선택'].to_numpy()
+        st.session_state['포트폴리오 선택'] = (
+            (st.session_state['포트폴리오 선택'] - set(page_codes[toggled & ~checked])) | set(page_codes[toggled & checked])
+        )
+
+    num_selected = len(st.session_state['포트폴리오 선택'])
+    if num_selected == 0:
+        st.warning("**분석할 종목을 1개 이상 선택해주세요.**")
+        if st.session_state.show_results:
+            # 선택을 모두 해제하면 이전 분석 결과도 숨깁니다. (결과 조각까지 다시 그리도록 전체 재실행)
+            st.session_state.show_results = False
+            st.rerun()
+    else:
+        st.caption(f"선택한 종목 {num_selected}개 — 아래 '포트폴리오 분석 실행' 버튼을 누르면 분석합니다.")
+
+@st.fragment
+def portfolio_section(dataset):
+    """포트폴리오 분석 실행 버튼과 결과. 버튼을 누를 때 현재 선택 집합과 기준 연도로 계산합니다."""
+    st.markdown("---")
+
+    # 선택 집합은 표 조각이 바꾸므로, 버튼을 누른 시점의 선택으로 분석합니다. (이 조각은 선택이 바뀔 때 다시 실행되지 않음)
+    if st.button('📈 포트폴리오 분석 실행', type='primary', use_container_width=True):
+        # 표와 같은 기준 연도의 스냅샷에서 선택된 종목(거래소코드)의 행을 가져옴 — 회사마다 한 행이므로 연도가 섞이지 않습니다.
+        df_snapshot = dataset.snapshot(st.session_state.get('stock_as_of_year')).frame
+        selected_stocks_df = df_snapshot[df_snapshot.index.isin(st.session_state['포트폴리오 선택'])]
+        if selected_stocks_df.empty:
+            st.warning("**분석할 종목을 1개 이상 선택해주세요.**")
+            st.session_state.show_results = False
+        elif '초과수익률_apply' in selected_stocks_df.columns:
+            st.session_state.portfolio_results = selected_stocks_df
+            st.session_state.show_results = True
         else:
-            average_excess_return = 0
-            st.warning("'초과수익률_apply' 컬럼이 없어 포트폴리오 수익률을 계산할 수 없습니다.")
-
-        col_res1, col_res2 = st.columns([1, 2])
-        with col_res1:
-            st.subheader("✅ 포트폴리오 성과 요약")
-            st.metric(label=f"평균 초과수익률 (vs 국고채 {benchmark_rate}%)", value=f"{average_excess_return:.2f} %p")
-            st.markdown(f"**선택된 종목 수:** {len(results_df)}개")
-            
-            # 선택된 종목들의 주요 정보를 표로 제공 (배당수익률 제거)
-            summary_cols = ['회사명', '초과수익률_apply', 'CAGR', '연간변동성', 'target_class']
-            summary_display_df = results_df[[col for col in summary_cols if col in results_df.columns]].copy()
-            summary_display_df.columns = ['회사명', '초과수익률 (%)', 'CAGR (%)', '연간변동성 (%)', '투자성향분류']
-            st.dataframe(summary_display_df, hide_index=True, use_container_width=True)
-
-        with col_res2:
+            st.error("⚠️ 분석에 필요한 '초과수익률_apply' 컬럼이 데이터에 없습니다. 데이터셋을 확인해주세요.")
+            st.session_state.show_results = False
+
+    st.markdown("---")
+    st.header("📊 현재 선택된 포트폴리오 분석 결과")
+    if st.session_state.show_results:
+        results_df = st.session_state.portfolio_results
+        if not results_df.empty:
+            benchmark_rate = 2.8 # 예시 국고채 금리
+        
+            # 포트폴리오의 총 초과수익률은 선택된 종목들의 평균 초과수익률로 계산
             if '초과수익률_apply' in results_df.columns:
-                st.subheader(f"📊 선택된 종목별 초과수익률")
-                fig = px.bar(results_df, x='회사명', y='초과수익률_apply', 
-                             color='초과수익률_apply', 
-                             color_continuous_scale=px.colors.diverging.RdYlGn, 
-                             color_continuous_midpoint=0,
-                             title="선택 종목별 초과수익률") 
-                st.plotly_chart(fig, use_container_width=True)
+                average_excess_return = results_df['초과수익률_apply'].mean()
             else:
-                st.info("초과수익률 데이터를 시각화할 수 없습니다.")
+                average_excess_return = 0
+                st.warning("'초과수익률_apply' 컬럼이 없어 포트폴리오 수익률을 계산할 수 없습니다.")
+
+            col_res1, col_res2 = st.columns([1, 2])
+            with col_res1:
+                st.subheader("✅ 포트폴리오 성과 요약")
+                st.metric(label=f"평균 초과수익률 (vs 국고채 {benchmark_rate}%)", value=f"{average_excess_return:.2f} %p")
+                st.markdown(f"**선택된 종목 수:** {len(results_df)}개")
+            
+                # 선택된 종목들의 주요 정보를 표로 제공 (배당수익률 제거)
+                summary_cols = ['회사명', '회계년도', '초과수익률_apply', 'CAGR', '연간변동성', 'target_class']
+                summary_display_df = results_df[[col for col in summary_cols if col in results_df.columns]].copy()
+                summary_display_df.columns = ['회사명', '회계년도', '초과수익률 (%)', 'CAGR (%)', '연간변동성 (%)', '투자성향분류']
+                st.dataframe(summary_display_df, hide_index=True, use_container_width=True)
+
+            with col_res2:
+                if '초과수익률_apply' in results_df.columns:
+                    st.subheader(f"📊 선택된 종목별 초과수익률")
+                    fig = px.bar(results_df, x='회사명', y='초과수익률_apply', 
+                                 color='초과수익률_apply', 
+                                 color_continuous_scale=px.colors.diverging.RdYlGn, 
+                                 color_continuous_midpoint=0,
+                                 title="선택 종목별 초과수익률") 
+                    st.plotly_chart(fig, use_container_width=True)
+                else:
+                    st.info("초과수익률 데이터를 시각화할 수 없습니다.")
+        else:
+            st.info("선택된 종목이 없습니다. 위에서 종목을 선택하고 '포트폴리오 분석 실행' 버튼을 눌러주세요.")
     else:
-        st.info("선택된 종목이 없습니다. 위에서 종목을 선택하고 '포트폴리오 분석 실행' 버튼을 눌러주세요.")
-else:
-    st.info("위 표에서 종목을 선택하고 '포트폴리오 분석 실행' 버튼을 누르면 이곳에 결과가 표시됩니다.")
+        st.info("위 표에서 종목을 선택하고 '포트폴리오 분석 실행' 버튼을 누르면 이곳에 결과가 표시됩니다.")
+
+stock_filter_section(dataset)
+portfolio_section(dataset)
 
 st.markdown("---")
 
@@ -0,0 +1,178 @@
+# stock_index.py — 개별 종목 페이지용 색인 (데이터셋 버전마다 한 번 생성해 모든 세션이 공유)
+#
+# StockDataset의 cached_property로 만들어지므로 같은 버전·같은 조회 조건에서는 한 번만 계산됩니다.
+# 색인이 돌려주는 행 위치는 StockDataset.frame의 위치(0부터 시작)이며, 화면에 보일 행은 frame.take(위치)로 바로 꺼냅니다.
+
+import bisect
+
+import numpy as np
+import pandas as pd
+
+# 한글 음절(가~힣)의 초성 19자. 음절 코드 = 0xAC00 + (초성 × 21 + 중성) × 28 + 종성
+HANGUL_INITIALS = "ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ"
+_HANGUL_FIRST, _HANGUL_LAST = 0xAC00, 0xD7A3
+_SYLLABLES_PER_INITIAL = 21 * 28
+_INITIAL_SET = frozenset(HANGUL_INITIALS)
+
+def hangul_initials(text):
+    """한글 음절을 초성으로 바꾼 문자열. 한글이 아닌 글자는 그대로 둡니다. (예: '삼성전자' → 'ㅅㅅㅈㅈ', 'LG화학' → 'LGㅎㅎ')"""
+    return "".join(
+        HANGUL_INITIALS[(ord(ch) - _HANGUL_FIRST) // _SYLLABLES_PER_INITIAL] if _HANGUL_FIRST <= ord(ch) <= _HANGUL_LAST else ch
+        for ch in text
+    )
+
+def is_initials_query(query):
+    """검색어가 초성(ㄱ~ㅎ)으로만 이루어져 있는지 여부. (공백 제외)"""
+    letters = query.replace(" ", "")
+    return bool(letters) and all(ch in _INITIAL_SET for ch in letters)
+
+def _ngram_postings(texts):
+    """{1글자/2글자 조각: 그 조각을 포함하는 문자열 번호 배열(오름차순)}."""
+    postings = {}
+    for number, text in enumerate(texts):
+        grams = set(text) | {text[i:i + 2] for i in range(len(text) - 1)}
+        for gram in grams:
+            postings.setdefault(gram, []).append(number)
+    return {gram: np.array(numbers, dtype=np.int32) for gram, numbers in postings.items()}
+
+class CompanySearchIndex:
+    """
+    회사명 검색 색인입니다. 행마다 검색하지 않고 중복을 뺀 회사명(수백~수천 개)만 색인합니다.
+    - 부분 일치: 1·2글자 조각(n-gram) 역색인으로 후보를 좁힌 뒤 실제로 포함하는지 확인 (대소문자 무시)
+    - 앞부분 일치: 정렬된 회사명에서 이진 탐색
+    - 초성 검색: 검색어가 초성으로만 되어 있으면 회사명의 초성 문자열에서 찾음 (예: 'ㅅㅅㅈㅈ' → 삼성전자)
+    결과는 회사명 번호 또는 해당 회사의 모든 행 위치(오름차순)로 돌려줍니다.
+    """
+
+    def __init__(self, names):
+        names = pd.Series(names)
+        if not isinstance(names.dtype, pd.CategoricalDtype):
+            names = names.astype('category')
+        codes = names.cat.codes.to_numpy()
+        self.names = [str(name) for name in names.cat.categories]
+        self.num_rows = len(codes)
+        self._folded = [name.casefold() for name in self.names]
+        self._initials = [hangul_initials(name) for name in self._folded]
+        self._postings = _ngram_postings(self._folded)
+        self._initial_postings = _ngram_postings(self._initials)
+        self._prefix_order = sorted(range(len(self.names)), key=self._folded.__getitem__)
+        self._prefix_keys = [self._folded[number] for number in self._prefix_order]
+        self._initial_prefix_order = sorted(range(len(self.names)), key=self._initials.__getitem__)
+        self._initial_prefix_keys = [self._initials[number] for number in self._initial_prefix_order]
+
+        # 회사명 번호별 행 위치 (CSR: _row_order[_row_offsets[n]:_row_offsets[n + 1]])
+        valid = np.flatnonzero(codes >= 0)
+        self._row_order = valid[np.argsort(codes[valid], kind='stable')]
+        counts = np.bincount(codes[valid], minlength=len(self.names))
+        self._row_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _targets(self, query):
+        """(정규화한 검색어, 검색 대상 문자열 목록, 조각 역색인, 앞부분 일치용 정렬 순서, 정렬된 키)"""
+        query = query.strip().casefold()
+        if is_initials_query(query):
+            return query, self._initials, self._initial_postings, self._initial_prefix_order, self._initial_prefix_keys
+        return query, self._folded, self._postings, self._prefix_order, self._prefix_keys
+
+    def match(self, query, prefix=False):
+        """검색어와 일치하는 회사명 번호 배열(오름차순). 빈 검색어는 None(필터 없음)을 반환합니다."""
+        query, texts, postings, prefix_order, prefix_keys = self._targets(query)
+        if not query:
+            return None
+        if prefix:
+            start = bisect.bisect_left(prefix_keys, query)
+            end = bisect.bisect_left(prefix_keys, query + "\U0010ffff", lo=start)
+            return np.sort(np.array(prefix_order[start:end], dtype=np.int32))
+
+        grams = [query] if len(query) == 1 else {query[i:i + 2] for i in range(len(query) - 1)}
+        candidates = None
+        for gram in sorted(grams, key=lambda gram: len(postings.get(gram, ()))):
+            posting = postings.get(gram)
+            if posting is None:
+                return np.empty(0, dtype=np.int32)
+            candidates = posting if candidates is None else np.intersect1d(candidates, posting, assume_unique=True)
+            if not len(candidates):
+                return candidates
+        if len(query) <= 2:
+            return candidates
+        return np.array([number for number in candidates.tolist() if query in texts[number]], dtype=np.int32)
+
+    def rows(self, query, prefix=False):
+        """검색어와 일치하는 회사의 모든 행 위치(오름차순). 빈 검색어는 None(필터 없음)을 반환합니다."""
+        numbers = self.match(query, prefix)
+        if numbers is None:
+            return None
+        pieces = [self._row_order[self._row_offsets[n]:self._row_offsets[n + 1]] for n in numbers.tolist()]
+        return np.sort(np.concatenate(pieces)) if pieces else np.empty(0, dtype=np.intp)
+
+    def row_mask(self, query, prefix=False):
+        """검색 결과를 행 단위 bool 배열로 반환합니다. 빈 검색어는 None(필터 없음)을 반환합니다."""
+        positions = self.rows(query, prefix)
+        if positions is None:
+            return None
+        mask = np.zeros(self.num_rows, dtype=bool)
+        mask[positions] = True
+        return mask
+
+def _sort_values(column):
+    """정렬용 float 배열. 범주형(회사명 등)은 문자열 순서의 순위로 바꾸고, 결측값은 NaN입니다."""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        categories = column.cat.categories.astype(str).to_numpy()
+        ranks = np.empty(len(categories))
+        ranks[np.argsort(categories, kind='stable')] = np.arange(len(categories))
+        codes = column.cat.codes.to_numpy()
+        values = np.full(len(codes), np.nan)
+        present = codes >= 0
+        values[present] = ranks[codes[present]]
+        return values
+    return pd.to_numeric(column, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+
+class StockViewIndex:
+    """
+    종목 표의 필터·정렬 색인입니다. 필터/정렬을 바꿀 때마다 isin + sort_values를 다시 하지 않도록,
+    - 정렬 컬럼별 오름차순/내림차순 행 순서(argsort 결과, 결측값은 양쪽 모두 맨 뒤, 같은 값은 원래 행 순서)
+    - 투자성향분류(target_class) 값별 소속 여부(bool 배열)
+    를 만들어 두고, 필터·정렬 조합을 "정렬 순서에서 소속된 행만 고르기"(O(n), 복사 없음)로 처리합니다.
+    정렬 순서는 컬럼이 처음 요청될 때 한 번 계산해 재사용합니다.
+    """
+
+    def __init__(self, frame, class_column='target_class'):
+        self._frame = frame
+        self.num_rows = len(frame)
+        self._orders = {}
+        self._class_masks = {}
+        classes = frame[class_column].to_numpy() if class_column in frame.columns else np.empty(0)
+        self._classes = {int(value): classes == value for value in pd.unique(classes) if pd.notna(value)}
+
+    def order(self, column, ascending=True):
+        """column 기준 정렬 순서(행 위치 배열). 결측값은 오름차순/내림차순 모두 맨 뒤입니다."""
+        orders = self._orders.get(column)
+        if orders is None:
+            values = _sort_values(self._frame[column])
+            present = np.flatnonzero(~np.isnan(values))
+            missing = np.flatnonzero(np.isnan(values))
+            present_values = values[present]
+            orders = self._orders[column] = (
+                np.concatenate([present[np.argsort(present_values, kind='stable')], missing]),
+                np.concatenate([present[np.argsort(-present_values, kind='stable')], missing]),
+            )
+        return orders[0] if ascending else orders[1]
+
+    def class_mask(self, classes):
+        """투자성향분류가 classes 중 하나인 행의 bool 배열. (조합별로 한 번만 계산)"""
+        key = tuple(sorted({int(value) for value in classes}))
+        mask = self._class_masks.get(key)
+        if mask is None:
+            mask = np.zeros(self.num_rows, dtype=bool)
+            for value in key:
+                if value in self._classes:
+                    mask |= self._classes[value]
+            self._class_masks[key] = mask
+        return mask
+
+    def positions(self, classes, sort_column, ascending=True, row_mask=None):
+        """classes 필터(와 row_mask, 예: 검색 결과)를 통과한 행의 위치를 sort_column 순서대로 반환합니다."""
+        order = self.order(sort_column, ascending)
+        keep = self.class_mask(classes)
+        if row_mask is not None:
+            keep = keep & row_mask
+        return order[keep.take(order)]
@@ -0,0 +1,156 @@
+# survey.py — 투자성향 설문 문항, 점수 계산, 설문 세션 상태
+#
+# 로그인/설문/결과 페이지는 이 모듈만 import하므로 pandas·numpy·pyarrow 같은 데이터 모듈을 불러오지 않습니다.
+# (데이터 로딩과 추천은 utils.py, 전처리는 data_pipeline.py)
+
+import streamlit as st
+
+# --- 설문 관련 함수 및 데이터 (변경 없음) ---
+questions = {
+    "age": {
+        "title": "1. 당신의 연령대는 어떻게 됩니까?",
+        "options": ["19세 이하", "20세~40세", "41세~50세", "51세~60세", "61세 이상"],
+        "scores": [12.5, 12.5, 9.3, 6.2, 3.1]
+    },
+    "investment_period": {
+        "title": "2. 투자하고자 하는 자금의 투자 가능 기간은 얼마나 됩니까?",
+        "options": ["6개월 이내", "6개월 이상~1년 이내", "1년 이상~2년 이내", "2년 이상~3년 이내", "3년 이상"],
+        "scores": [3.1, 6.2, 9.3, 12.5, 15.6]
+    },
+    "investment_experience": {
+        "title": "3. 다음 중 투자경험과 가장 가까운 것은 어느 것입니까? (중복 가능)",
+        "options": [
+            "은행의 예·적금, 국채, 지방채, 보증채, MMF, CMA 등",
+            "금융채, 신용도가 높은 회사채, 채권형펀드, 원금보존추구형ELS 등",
+            "신용도 중간 등급의 회사채, 원금의 일부만 보장되는 ELS, 혼합형펀드 등",
+            "신용도가 낮은 회사채, 주식, 원금이 보장되지 않는 ELS, 시장수익률 수준의 수익을 추구하는 주식형펀드 등",
+            "ELW, 선물옵션, 시장수익률 이상의 수익을 추구하는 주식형펀드, 파생상품에 투자하는 펀드, 주식 신용거래 등"
+        ],
+        "scores": [3.1, 6.2, 9.3, 12.5, 15.6]
+    },
+    "knowledge_level": {
+        "title": "4. 금융상품 투자에 대한 본인의 지식수준은 어느 정도라고 생각하십니까?",
+        "options": [
+            "[매우 낮은 수준] 투자의사 결정을 스스로 내려본 경험이 없는 정도",
+            "[낮은 수준] 주식과 채권의 차이를 구별할 수 있는 정도",
+            "[높은 수준] 투자할 수 있는 대부분의 금융상품의 차이를 구별할 수 있는 정도",
+            "[매우 높은 수준] 금융상품을 비롯하여 모든 투자대상 상품의 차이를 이해할 수 있는 정도"
+        ],
+        "scores": [3.1, 6.2, 9.3, 12.5]
+    },
+    "asset_ratio": {
+        "title": "5. 현재 투자하고자 하는 자금은 전체 금융자산(부동산 등을 제외) 중 어느 정도의 비중을 차지합니까?",
+        "options": ["10% 이내", "10% 이상~20% 이내", "20% 이상~30% 이내", "30% 이상~40% 이내", "40% 이상"],
+        "scores": [15.6, 12.5, 9.3, 6.2, 3.1]
+    },
+    "income_source": {
+        "title": "6. 다음 중 당신의 수입원을 가장 잘 나타내고 있는 것은 어느 것입니까?",
+        "options": [
+            "현재 일정한 수입이 발생하고 있으며, 향후 현재 수준을 유지하거나 증가할 것으로 예상된다.",
+            "현재 일정한 수입이 발생하고 있으나, 향후 감소하거나 불안정할 것으로 예상된다.",
+            "현재 일정한 수입이 없으며, 연금이 주수입원이다."
+        ],
+        "scores": [9.3, 6.2, 3.1]
+    },
+    "risk_tolerance": {
+        "title": "7. 만약 투자원금에 손실이 발생할 경우 다음 중 감수할 수 있는 손실 수준은 어느 것입니까?",
+        "options": [
+            "무슨 일이 있어도 투자원금은 보전되어야 한다.",
+            "10% 미만까지는 손실을 감수할 수 있을 것 같다.",
+            "20% 미만까지는 손실을 감수할 수 있을 것 같다.",
+            "기대수익이 높다면 위험이 높아도 상관하지 않겠다."
+        ],
+        "scores": [-6.2, 6.2, 12.5, 18.7]
+    }
+}
+
+def calculate_score(answers):
+    # 총점은 answers에 들어 있는 순서와 상관없이 문항 순서대로 더합니다. (부동소수점 합이 survey_batch.score_batch와 항상 같도록)
+    total_score = 0
+    score_breakdown = {}
+    for key in questions:
+        answer = answers.get(key)
+        if answer is None: continue
+        question = questions[key]
+        if key == "investment_experience":
+            score = max([question['scores'][i] for i in answer]) if answer else 0
+        else:
+            score = question['scores'][answer]
+        score_breakdown[key] = score
+        total_score += score
+    return total_score, score_breakdown
+
+# 투자성향 유형과 점수 구간: 총점이 INVESTMENT_TYPE_THRESHOLDS[i] 이하인 첫 구간의 유형 (80점 초과는 마지막 유형)
+INVESTMENT_TYPE_THRESHOLDS = [20, 40, 60, 80]
+INVESTMENT_TYPES = [
+    ("안정형", "#4CAF50"),
+    ("안정추구형", "#8BC34A"),
+    ("위험중립형", "#FFC107"),
+    ("적극투자형", "#FF9800"),
+    ("공격투자형", "#F44336"),
+]
+
+def classify_investment_type(score):
+    for threshold, investment_type in zip(INVESTMENT_TYPE_THRESHOLDS, INVESTMENT_TYPES):
+        if score <= threshold:
+            return investment_type
+    return INVESTMENT_TYPES[-1]
+
+def validate_answers():
+    errors = set()
+    for key in questions.keys():
+        if key not in st.session_state.answers or st.session_state.answers[key] is None:
+            errors.add(key)
+        elif key == "investment_experience" and not st.session_state.answers[key]:
+            errors.add(key)
+    st.session_state.validation_errors = errors
+    return len(errors) == 0
+
+def show_footer():
+    st.markdown("---")
+    st.markdown("💡 **주의사항**: 본 진단 결과는 참고용이며, 실제 투자 결정 시에는 전문가와 상담하시기 바랍니다.")
+
+
+# --- 설문 관련 세션 상태 초기화 함수 (최신 상태 반영) ---
+def reset_survey_state():
+    if 'answers' in st.session_state:
+        del st.session_state.answers
+    if 'survey_completed' in st.session_state:
+        del st.session_state.survey_completed
+    if 'validation_errors' in st.session_state:
+        del st.session_state.validation_errors
+    if 'investment_type' in st.session_state:
+        del st.session_state.investment_type
+    if 'total_score' in st.session_state:
+        del st.session_state.total_score
+    if 'score_breakdown' in st.session_state:
+        del st.session_state.score_breakdown
+    
+    if 'portfolio_results' in st.session_state:
+        del st.session_state.portfolio_results
+    if 'show_results' in st.session_state:
+        del st.session_state.show_results
+    if '포트폴리오 선택' in st.session_state:
+        del st.session_state['포트폴리오 선택']
+    
+    if 'initial_recommendation_loaded' in st.session_state:
+        del st.session_state.initial_recommendation_loaded
+    # 대시보드에서 사용하는 세션 상태 이름 (최신 버전으로 반영)
+    if 'backtest_results_all_conditions' in st.session_state:
+        del st.session_state.backtest_results_all_conditions
+    if 'recommended_fund_stocks_latest' in st.session_state:
+        del st.session_state.recommended_fund_stocks_latest
+    if 'backtest_notice' in st.session_state:
+        del st.session_state.backtest_notice
+    
+    if 'show_fund_details' in st.session_state: 
+        del st.session_state.show_fund_details
+    if 'wobble_triggered' in st.session_state: 
+        del st.session_state.wobble_triggered 
+    if 'analysis_started_at' in st.session_state:
+        del st.session_state.analysis_started_at
+    # 다시 시작하는 설문부터는 최신 데이터셋 버전을 사용
+    if 'stock_store' in st.session_state:
+        del st.session_state.stock_store
+
+    st.session_state.reset_survey_flag = False
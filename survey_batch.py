@@ -0,0 +1,203 @@
+# survey_batch.py — 설문 응답 일괄 채점 (NumPy)
+#
+# 과거 고객 응답 수만 건을 한 번에 채점·분류합니다. 결과는 survey.calculate_score / classify_investment_type과 정확히 같습니다.
+# 응답 표는 문항 key별 선택지 번호 배열이며, 중복 선택 문항(investment_experience)은 선택지 i를 1 << i 비트로 표시한 비트마스크입니다.
+# 응답하지 않은 문항은 MISSING_ANSWER(-1)로 표시합니다. (calculate_score에서 값이 None인 문항처럼 점수에서 빠짐)
+
+import threading
+
+import numpy as np
+
+from survey import INVESTMENT_TYPE_THRESHOLDS, INVESTMENT_TYPES, questions
+
+SURVEY_KEYS = list(questions) # 문항별 점수의 열 순서이자 총점 합산 순서 (calculate_score도 answers의 key 순서와 상관없이 이 순서로 더함)
+MULTI_SELECT_KEYS = {"investment_experience"}
+MISSING_ANSWER = -1
+
+def experience_bitmask(selected):
+    """선택한 선택지 번호 목록을 비트마스크로 바꿉니다. (예: [0, 3] → 0b1001)"""
+    mask = 0
+    for index in selected:
+        mask |= 1 << index
+    return mask
+
+def _score_table(key):
+    """
+    문항별 점수 조회표.
+    단일 선택 문항은 선택지 번호 → 점수, 중복 선택 문항은 비트마스크(선택지 5개면 32개) → 선택한 선택지 점수 중 최댓값입니다.
+    """
+    scores = questions[key]['scores']
+    if key in MULTI_SELECT_KEYS:
+        return np.array([
+            max(scores[i] for i in range(len(scores)) if mask >> i & 1) if mask else 0
+            for mask in range(1 << len(scores))
+        ], dtype=float)
+    return np.array(scores, dtype=float)
+
+_SCORE_TABLES = {key: _score_table(key) for key in SURVEY_KEYS}
+_THRESHOLDS = np.array(INVESTMENT_TYPE_THRESHOLDS, dtype=float)
+_TYPE_NAMES = np.array([name for name, _ in INVESTMENT_TYPES], dtype=object)
+_TYPE_COLORS = np.array([color for _, color in INVESTMENT_TYPES], dtype=object)
+
+def answers_to_table(answers_list):
+    """설문 페이지 형식의 answers dict 목록을 응답 표({문항 key: int64 배열})로 바꿉니다."""
+    table = {}
+    for key in SURVEY_KEYS:
+        codes = np.empty(len(answers_list), dtype=np.int64)
+        for row, answers in enumerate(answers_list):
+            answer = answers.get(key)
+            if answer is None:
+                codes[row] = MISSING_ANSWER
+            elif key in MULTI_SELECT_KEYS:
+                codes[row] = experience_bitmask(answer)
+            else:
+                codes[row] = answer
+        table[key] = codes
+    return table
+
+def score_batch(table):
+    """
+    응답 표(dict 또는 DataFrame, 문항 key별 컬럼)를 채점해 (총점 배열, 문항별 점수 2차원 배열)을 반환합니다.
+    - 문항별 점수의 열 순서는 SURVEY_KEYS이며, 응답하지 않은 문항은 NaN입니다.
+    - 총점은 calculate_score처럼 문항 순서대로 한 열씩 더하므로 부동소수점 반올림까지 같은 값이 나옵니다.
+    범위를 벗어난 선택지 번호가 있으면 ValueError가 발생합니다.
+    """
+    columns = []
+    for key in SURVEY_KEYS:
+        codes = np.asarray(table[key], dtype=np.int64)
+        lookup = _SCORE_TABLES[key]
+        missing = codes == MISSING_ANSWER
+        invalid = ~missing & ((codes < 0) | (codes >= len(lookup)))
+        if invalid.any():
+            raise ValueError(f"'{key}' 문항에 범위를 벗어난 응답이 있습니다: {codes[invalid][:5].tolist()}")
+        scores = lookup.take(np.where(missing, 0, codes))
+        scores[missing] = np.nan
+        columns.append(scores)
+
+    total = np.zeros(len(columns[0]))
+    for scores in columns:
+        total += np.where(np.isnan(scores), 0.0, scores)
+    return total, np.column_stack(columns)
+
+def investment_type_codes(scores):
+    """총점 배열을 투자성향 유형 번호(INVESTMENT_TYPES의 위치) 배열로 바꿉니다. (구간 상한 포함: 20점은 안정형)"""
+    return np.searchsorted(_THRESHOLDS, np.asarray(scores, dtype=float), side='left')
+
+def classify_batch(scores):
+    """총점 배열을 (유형 이름 배열, 색상 배열)로 분류합니다. classify_investment_type의 일괄 버전입니다."""
+    codes = investment_type_codes(scores)
+    return _TYPE_NAMES[codes], _TYPE_COLORS[codes]
+
+
+# --- 모든 응답 조합의 결과표 ---
+# 문항별 선택지 수가 정해져 있으므로(5×5×32×4×5×3×4 = 192,000가지, 투자경험은 비트마스크 32가지) 모든 조합의 총점과 유형을
+# 미리 계산해 두고, 응답을 혼합 기수(mixed-radix) 정수로 바꿔 배열에서 바로 꺼냅니다. (문항별 점수는 조회표에서 O(1)로 복원)
+
+ANSWER_RADICES = [len(_SCORE_TABLES[key]) for key in SURVEY_KEYS] # 문항별 자릿수 (앞 문항이 상위 자리)
+
+_SCORE_LISTS = {key: table.tolist() for key, table in _SCORE_TABLES.items()} # 한 건 조회용 (NumPy 스칼라 변환 없이)
+
+def _answer_digits(answers):
+    digits = []
+    for key, radix in zip(SURVEY_KEYS, ANSWER_RADICES):
+        answer = answers.get(key)
+        if answer is None:
+            raise ValueError(f"'{key}' 문항에 응답하지 않았습니다.")
+        digit = experience_bitmask(answer) if key in MULTI_SELECT_KEYS else answer
+        if not 0 <= digit < radix:
+            raise ValueError(f"'{key}' 문항의 응답이 범위를 벗어났습니다: {answer}")
+        digits.append(digit)
+    return digits
+
+def _digits_to_code(digits):
+    """문항별 자릿값 목록을 결과표 위치(혼합 기수 정수)로 바꿉니다. (앞 문항이 상위 자리)"""
+    code = 0
+    for digit, radix in zip(digits, ANSWER_RADICES):
+        code = code * radix + digit
+    return code
+
+def encode_answers(answers):
+    """모든 문항에 응답한 answers dict를 결과표 위치(혼합 기수 정수)로 바꿉니다. 미응답/범위를 벗어난 응답은 ValueError."""
+    return _digits_to_code(_answer_digits(answers))
+
+def decode_answer_codes(codes):
+    """결과표 위치(정수 또는 배열)를 응답 표({문항 key: 선택지 번호/비트마스크})로 되돌립니다."""
+    remaining = np.asarray(codes, dtype=np.int64)
+    table = {}
+    for key, radix in zip(reversed(SURVEY_KEYS), reversed(ANSWER_RADICES)):
+        remaining, table[key] = np.divmod(remaining, radix)
+    return {key: table[key] for key in SURVEY_KEYS}
+
+class OutcomeTable:
+    """
+    모든 응답 조합의 총점(float64)과 투자성향 유형 번호(int8) 배열입니다. (약 1.7 MB)
+    값은 score_batch/investment_type_codes로 계산하므로 calculate_score/classify_investment_type과 정확히 같습니다.
+    """
+
+    def __init__(self):
+        self.size = int(np.prod(ANSWER_RADICES))
+        self.totals, _ = score_batch(decode_answer_codes(np.arange(self.size)))
+        self.type_codes = investment_type_codes(self.totals).astype(np.int8)
+
+    def lookup(self, answers):
+        """
+        answers dict 하나의 (총점, 문항별 점수 dict, 투자성향, 색상)을 반환합니다.
+        한 건 조회도 응답을 자릿값으로 바꾸는 파이썬 반복이 필요하므로 calculate_score보다 빠르지 않습니다.
+        (결과 페이지는 calculate_score를 그대로 쓰고, 결과표는 분포·유형 경계 같은 전체 조합 분석에 씁니다.)
+        """
+        digits = _answer_digits(answers)
+        code = _digits_to_code(digits)
+        score_breakdown = {key: _SCORE_LISTS[key][digit] for key, digit in zip(SURVEY_KEYS, digits)}
+        investment_type, color = INVESTMENT_TYPES[self.type_codes[code]]
+        return float(self.totals[code]), score_breakdown, investment_type, color
+
+    def score_distribution(self):
+        """모든 응답 조합에 대한 (총점 값 배열, 조합 수 배열). (총점 오름차순)"""
+        return np.unique(self.totals, return_counts=True)
+
+    def type_distribution(self):
+        """투자성향 유형별 응답 조합 수 {유형: 조합 수}."""
+        counts = np.bincount(self.type_codes, minlength=len(INVESTMENT_TYPES))
+        return {name: int(count) for (name, _), count in zip(INVESTMENT_TYPES, counts)}
+
+    def flip_rates(self):
+        """
+        문항별로, 다른 문항 응답을 고정했을 때 그 문항의 응답만 바꿔서 투자성향이 달라질 수 있는 조합의 비율 {문항 key: 비율}.
+        (결과표를 문항 수 차원의 배열로 보고 각 축을 따라 유형의 최솟값과 최댓값을 비교)
+        """
+        types = self.type_codes.reshape(ANSWER_RADICES)
+        return {
+            key: float((types.max(axis=axis) != types.min(axis=axis)).mean())
+            for axis, key in enumerate(SURVEY_KEYS)
+        }
+
+    def boundary_flips(self, answers):
+        """
+        answers에서 문항 하나의 응답만 바꿨을 때 투자성향이 달라지는 경우 [(문항 key, 바꾼 응답, 새 투자성향)].
+        (투자경험은 하나 이상 선택한 조합만 포함)
+        """
+        code = encode_answers(answers)
+        current = self.type_codes[code]
+        places = np.cumprod([1] + ANSWER_RADICES[:0:-1])[::-1] # 문항별 자리값
+        flips = []
+        for key, radix, place in zip(SURVEY_KEYS, ANSWER_RADICES, places.tolist()):
+            digit = code // place % radix
+            for other in range(1 if key in MULTI_SELECT_KEYS else 0, radix):
+                new_type = self.type_codes[code + (other - digit) * place]
+                if other == digit or new_type == current:
+                    continue
+                answer = [i for i in range(radix.bit_length() - 1) if other >> i & 1] if key in MULTI_SELECT_KEYS else other
+                flips.append((key, answer, INVESTMENT_TYPES[new_type][0]))
+        return flips
+
+_OUTCOME_TABLE = None
+_OUTCOME_LOCK = threading.Lock()
+
+def get_outcome_table():
+    """프로세스에서 한 번만 만드는 OutcomeTable. (수십 ms)"""
+    global _OUTCOME_TABLE
+    if _OUTCOME_TABLE is None:
+        with _OUTCOME_LOCK:
+            if _OUTCOME_TABLE is None:
+                _OUTCOME_TABLE = OutcomeTable()
+    return _OUTCOME_TABLE
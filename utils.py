@@ -1,268 +1,255 @@
 import streamlit as st
 import pandas as pd
-import numpy as np
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-# 프로젝트 루트 기준 데이터 경로
-PROJECT_ROOT = Path(__file__).resolve().parent
-DATA_DIR = PROJECT_ROOT / "data"
-STOCK_DATASET_PATH = DATA_DIR / "stock_dataset.xlsx"
-
-# --- 설문 관련 함수 및 데이터 (변경 없음) ---
-questions = {
-    "age": {
-        "title": "1. 당신의 연령대는 어떻게 됩니까?",
-        "options": ["19세 이하", "20세~40세", "41세~50세", "51세~60세", "61세 이상"],
-        "scores": [12.5, 12.5, 9.3, 6.2, 3.1]
-    },
-    "investment_period": {
-        "title": "2. 투자하고자 하는 자금의 투자 가능 기간은 얼마나 됩니까?",
-        "options": ["6개월 이내", "6개월 이상~1년 이내", "1년 이상~2년 이내", "2년 이상~3년 이내", "3년 이상"],
-        "scores": [3.1, 6.2, 9.3, 12.5, 15.6]
-    },
-    "investment_experience": {
-        "title": "3. 다음 중 투자경험과 가장 가까운 것은 어느 것입니까? (중복 가능)",
-        "options": [
-            "은행의 예·적금, 국채, 지방채, 보증채, MMF, CMA 등",
-            "금융채, 신용도가 높은 회사채, 채권형펀드, 원금보존추구형ELS 등",
-            "신용도 중간 등급의 회사채, 원금의 일부만 보장되는 ELS, 혼합형펀드 등",
-            "신용도가 낮은 회사채, 주식, 원금이 보장되지 않는 ELS, 시장수익률 수준의 수익을 추구하는 주식형펀드 등",
-            "ELW, 선물옵션, 시장수익률 이상의 수익을 추구하는 주식형펀드, 파생상품에 투자하는 펀드, 주식 신용거래 등"
-        ],
-        "scores": [3.1, 6.2, 9.3, 12.5, 15.6]
-    },
-    "knowledge_level": {
-        "title": "4. 금융상품 투자에 대한 본인의 지식수준은 어느 정도라고 생각하십니까?",
-        "options": [
-            "[매우 낮은 수준] 투자의사 결정을 스스로 내려본 경험이 없는 정도",
-            "[낮은 수준] 주식과 채권의 차이를 구별할 수 있는 정도",
-            "[높은 수준] 투자할 수 있는 대부분의 금융상품의 차이를 구별할 수 있는 정도",
-            "[매우 높은 수준] 금융상품을 비롯하여 모든 투자대상 상품의 차이를 이해할 수 있는 정도"
-        ],
-        "scores": [3.1, 6.2, 9.3, 12.5]
-    },
-    "asset_ratio": {
-        "title": "5. 현재 투자하고자 하는 자금은 전체 금융자산(부동산 등을 제외) 중 어느 정도의 비중을 차지합니까?",
-        "options": ["10% 이내", "10% 이상~20% 이내", "20% 이상~30% 이내", "30% 이상~40% 이내", "40% 이상"],
-        "scores": [15.6, 12.5, 9.3, 6.2, 3.1]
-    },
-    "income_source": {
-        "title": "6. 다음 중 당신의 수입원을 가장 잘 나타내고 있는 것은 어느 것입니까?",
-        "options": [
-            "현재 일정한 수입이 발생하고 있으며, 향후 현재 수준을 유지하거나 증가할 것으로 예상된다.",
-            "현재 일정한 수입이 발생하고 있으나, 향후 감소하거나 불안정할 것으로 예상된다.",
-            "현재 일정한 수입이 없으며, 연금이 주수입원이다."
-        ],
-        "scores": [9.3, 6.2, 3.1]
-    },
-    "risk_tolerance": {
-        "title": "7. 만약 투자원금에 손실이 발생할 경우 다음 중 감수할 수 있는 손실 수준은 어느 것입니까?",
-        "options": [
-            "무슨 일이 있어도 투자원금은 보전되어야 한다.",
-            "10% 미만까지는 손실을 감수할 수 있을 것 같다.",
-            "20% 미만까지는 손실을 감수할 수 있을 것 같다.",
-            "기대수익이 높다면 위험이 높아도 상관하지 않겠다."
-        ],
-        "scores": [-6.2, 6.2, 12.5, 18.7]
-    }
-}
-
-def calculate_score(answers):
-    total_score = 0
-    score_breakdown = {}
-    for key, answer in answers.items():
-        if answer is None: continue
-        question = questions[key]
-        if key == "investment_experience":
-            score = max([question['scores'][i] for i in answer]) if answer else 0
-        else:
-            score = question['scores'][answer]
-        score_breakdown[key] = score
-        total_score += score
-    return total_score, score_breakdown
-
-def classify_investment_type(score):
-    if score <= 20: return "안정형", "#4CAF50"
-    elif score <= 40: return "안정추구형", "#8BC34A"
-    elif score <= 60: return "위험중립형", "#FFC107"
-    elif score <= 80: return "적극투자형", "#FF9800"
-    else: return "공격투자형", "#F44336"
-
-def validate_answers():
-    errors = set()
-    for key in questions.keys():
-        if key not in st.session_state.answers or st.session_state.answers[key] is None:
-            errors.add(key)
-        elif key == "investment_experience" and not st.session_state.answers[key]:
-            errors.add(key)
-    st.session_state.validation_errors = errors
-    return len(errors) == 0
-
-def show_footer():
-    st.markdown("---")
-    st.markdown("💡 **주의사항**: 본 진단 결과는 참고용이며, 실제 투자 결정 시에는 전문가와 상담하시기 바랍니다.")
-
-
-# --- 설문 관련 세션 상태 초기화 함수 (최신 상태 반영) ---
-def reset_survey_state():
-    if 'answers' in st.session_state:
-        del st.session_state.answers
-    if 'survey_completed' in st.session_state:
-        del st.session_state.survey_completed
-    if 'validation_errors' in st.session_state:
-        del st.session_state.validation_errors
-    if 'investment_type' in st.session_state:
-        del st.session_state.investment_type
-    if 'total_score' in st.session_state:
-        del st.session_state.total_score
-    if 'score_breakdown' in st.session_state:
-        del st.session_state.score_breakdown
-    
-    if 'portfolio_results' in st.session_state:
-        del st.session_state.portfolio_results
-    if 'show_results' in st.session_state:
-        del st.session_state.show_results
-    if '포트폴리오 선택' in st.session_state:
-        del st.session_state['포트폴리오 선택']
-    
-    if 'initial_recommendation_loaded' in st.session_state:
-        del st.session_state.initial_recommendation_loaded
-    # 대시보드에서 사용하는 세션 상태 이름 (최신 버전으로 반영)
-    if 'backtest_results_all_conditions' in st.session_state:
-        del st.session_state.backtest_results_all_conditions
-    if 'recommended_fund_stocks_latest' in st.session_state:
-        del st.session_state.recommended_fund_stocks_latest
-    
-    if 'show_fund_details' in st.session_state: 
-        del st.session_state.show_fund_details
-    if 'wobble_triggered' in st.session_state: 
-        del st.session_state.wobble_triggered 
-
-    st.session_state.reset_survey_flag = False
+# 전처리 파이프라인은 Streamlit 없이도 실행되도록 data_pipeline.py에 있습니다. (python data_pipeline.py build)
+# 앱은 파이프라인이 만든 버전별 아티팩트를 붙여 쓰기만 합니다.
+from data_pipeline import (
+    BACKTEST_COLUMNS, BACKTEST_TOP_N, CURRENT_POINTER_FILE, STOCK_DATASET_PATH,
+    BacktestStore, DatasetError, EmptyDatasetError, StockDataset,
+    artifacts_dir_for, ensure_current_artifact, load_backtest_artifact, open_artifact, read_current_manifest,
+    single_flight,
+)
+from data_pipeline import single_flight_stats  # noqa: F401 (기존 `utils.single_flight_stats()` 호환용으로 다시 내보냄)
+
+# 설문 관련 함수는 가벼운 survey.py에 있습니다. (기존 `from utils import ...` 호환용으로 다시 내보냄)
+from survey import (  # noqa: F401
+    questions, calculate_score, classify_investment_type, validate_answers, show_footer, reset_survey_state,
+)
+
+# True이면 아티팩트가 없거나 엑셀과 맞지 않을 때 앱이 직접 파이프라인을 한 번 실행합니다. (로컬 실행용)
+# 배포 환경에서는 False로 두고 `python data_pipeline.py build`로 미리 만든 아티팩트만 사용합니다.
+BUILD_MISSING_ARTIFACTS = True
+
+logger = logging.getLogger(__name__)
 
 
 # --- 대시보드 데이터 로딩 및 추천 함수 ---
 
-@st.cache_data(ttl=3600) # 데이터 로딩 성능 최적화 (1시간 TTL)
-def load_and_process_data(file_path=None): 
+def load_and_process_data(file_path=None, columns=None, years=None):
     """
-    data/stock_dataset.xlsx 파일을 로드하고 필요한 전처리를 수행합니다.
-    - 필수 컬럼 존재 여부 확인
-    - 숫자형 컬럼 타입 변환 및 NaN 처리
-    - '위험도' 컬럼 계산 (기존 로직 유지)
-    - '초과수익률' 컬럼은 사용하지 않도록 코드에서 제거
-    - 2017년 이후의 데이터만 필터링
+    data/stock_dataset.xlsx로 만든 전처리 아티팩트를 불러옵니다.
+    전처리(필수 컬럼 확인, 숫자형 변환, 위험도, 연간변동성 분위, 2017년 이후 필터링)는 data_pipeline.py가 수행하고,
+    결과는 data/artifacts/stock_dataset/<버전>/에 저장되어 엑셀이 바뀌지 않은 한 다시 계산하지 않습니다.
+    columns/years를 주면 해당 컬럼과 회계년도 파티션만 읽습니다. (StockStore.frame 참고)
+    호출할 때마다 새 DataFrame을 만들므로, 페이지에서는 get_session_dataset()의 공유 데이터셋을 사용합니다.
     """
     path = Path(file_path) if file_path else STOCK_DATASET_PATH
+    store = _load_stock_store(path)
+    if store is None:
+        return pd.DataFrame()
+    return store.frame(columns, years)
+
+def _load_stock_store(path):
+    """
+    현재 아티팩트를 StockStore로 엽니다. 처리할 행이 없으면 None.
+    아티팩트 파일을 붙이는 것뿐이므로 실제 데이터는 조회할 때 필요한 부분만 읽힙니다.
+    """
     try:
-        df = pd.read_excel(path, dtype={'거래소코드': str})
+        if BUILD_MISSING_ARTIFACTS:
+            manifest = ensure_current_artifact(path)
+        else:
+            manifest = read_current_manifest(artifacts_dir_for(path))
+            if manifest is None:
+                st.error("⚠️ 전처리된 데이터가 없습니다. `python data_pipeline.py build`를 먼저 실행해주세요.")
+                st.stop()
+                return None
+        return open_artifact(artifacts_dir_for(path), manifest)
     except FileNotFoundError:
         st.error(f"⚠️ 데이터 파일 '{path}'을(를) 찾을 수 없습니다. data/ 폴더에 stock_dataset.xlsx를 넣어주세요.")
         st.stop()
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"⚠️ 데이터 로드 중 오류 발생: {e}")
+        return None
+    except EmptyDatasetError as e:
+        st.warning(f"⚠️ {e}")
+        return None
+    except DatasetError as e:
+        st.error(f"⚠️ {e}")
         st.stop()
-        return pd.DataFrame()
+        return None
 
-    # 필수 컬럼 정의 ('초과수익률' 제거됨)
-    required_cols = [
-        '회사명', '거래소코드', '회계년도', '이자보상배율(이자비용)',
-        '영업활동으로 인한 현금흐름(*)(천원)', '투자활동으로 인한 현금흐름(*)(천원)',
-        '재무활동으로 인한 현금흐름(*)(천원)', '당좌비율', '정상영업이익증가율',
-        '순이익증가율', '매출액증가율', '유동자산(*)(천원)', '부채(*)(천원)',
-        '당기순이익(손실)(천원)', '산업코드', '산업명', '수정종가',
-        '연간변동성', 'EBITDA(천원)', 'x3', 'x4', 'roe', 'pcr',
-        'psr', 'ln(매출액)', '잉여현금흐름 비율', 'CAGR', 'target_class' 
-    ]
-    
-    missing_cols = [col for col in required_cols if col not in df.columns]
-    if missing_cols:
-        st.error(f"⚠️ 데이터 파일 '{path}'에 다음 필수 컬럼이 누락되었습니다: {', '.join(missing_cols)}")
-        st.stop() 
-
-    # 숫자형 컬럼 변환 및 NaN 처리 ('초과수익률' 제거됨)
-    numeric_cols = [
-        '이자보상배율(이자비용)', '영업활동으로 인한 현금흐름(*)(천원)',
-        '투자활동으로 인한 현금흐름(*)(천원)', '재무활동으로 인한 현금흐름(*)(천원)',
-        '당좌비율', '정상영업이익증가율', '순이익증가율', '매출액증가율',
-        '유동자산(*)(천원)', '부채(*)(천원)', '당기순이익(손실)(천원)',
-        '수정종가', '연간변동성', 'EBITDA(천원)', 'x3', 'x4',
-        'roe', 'pcr', 'psr', 'ln(매출액)', '잉여현금흐름 비율', 'CAGR',
-        'target_class'
-    ]
-    
-    for col in numeric_cols:
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce')
-            if col in ['연간변동성', 'CAGR']: 
-                df[col] = df[col].fillna(0) 
-            elif col == 'target_class': 
-                 df[col] = df[col].fillna(-1).astype(int) 
-        
-    if '배당수익률' not in df.columns:
-        df['배당수익률'] = np.random.uniform(0, 5, len(df))
-
-    df.dropna(subset=['회사명', '회계년도'], inplace=True) 
-
-    df_processed = df.copy() 
-    
-    # --- 2017년 이후 데이터만 필터링 ---
-    if '회계년도' in df_processed.columns:
-        df_processed['회계년도'] = pd.to_numeric(df_processed['회계년도'], errors='coerce')
-        df_processed.dropna(subset=['회계년도'], inplace=True) 
-
-        df_processed = df_processed[df_processed['회계년도'] >= 2017].copy()
-        if df_processed.empty:
-            st.warning("⚠️ 2017년 이후의 유효한 회계년도 데이터가 없어 분석을 수행할 수 없습니다.")
-            return pd.DataFrame()
-    else:
-        st.error("⚠️ '회계년도' 컬럼이 없어 연도별 필터링을 수행할 수 없습니다.")
-        return pd.DataFrame()
-    # --- 2017년 이후 데이터 필터링 끝 ---
-
-    col_c1, col_c2 = '이자보상배율(이자비용)', '영업활동으로 인한 현금흐름(*)(천원)'
-    if col_c1 in df_processed.columns and col_c2 in df_processed.columns:
-        df_processed.sort_values(by=['거래소코드', '회계년도'], ascending=True, inplace=True)
-
-        temp_df = df_processed[['거래소코드', '회계년도', col_c1, col_c2]].copy()
-        temp_df['C1_flag'] = (temp_df[col_c1].fillna(999) < 1).astype(int) 
-        temp_df['C2_flag'] = (temp_df[col_c2].fillna(9999) < 0).astype(int)
-        
-        temp_df['C1_3yr_sum'] = temp_df.groupby('거래소코드')['C1_flag'].rolling(window=3, min_periods=1).sum().reset_index(level=0, drop=True) # min_periods=1로 변경
-        temp_df['C2_3yr_sum'] = temp_df.groupby('거래소코드')['C2_flag'].rolling(window=3, min_periods=1).sum().reset_index(level=0, drop=True) # min_periods=1로 변경
-        
-        temp_df['C1_met'] = (temp_df['C1_3yr_sum'] == 3) 
-        temp_df['C2_met'] = (temp_df['C2_3yr_sum'] == 3) 
-
-        conditions = [
-            (temp_df['C1_met'] == True) & (temp_df['C2_met'] == True), 
-            (temp_df['C1_met'] | temp_df['C2_met']) == True             
-        ] 
-        choices = [2, 1] 
-        temp_df['위험도'] = np.select(conditions, choices, default=0) 
-        
-        # --- 수정된 부분: NaN 값을 0으로 채워서 행이 제거되지 않도록 함 ---
-        temp_df['위험도'] = temp_df['위험도'].fillna(0) # 3년치 데이터가 부족하면 '저위험'(0)으로 간주
-        # df_processed.dropna(subset=['위험도'], inplace=True) # 이 줄은 이제 필요 없음, 삭제됨
-        # --- 수정된 부분 끝 ---
-
-        df_processed = df_processed.merge(
-            temp_df[['거래소코드', '회계년도', '위험도']], 
-            on=['거래소코드', '회계년도'], 
-            how='left'
-        )
-        
-        # merge 후에 발생할 수 있는 NaN (예: merge 키가 없는 경우)은 계속 제거
-        # 하지만 위험도 계산으로 인한 NaN은 이제 없어야 함
-        df_processed.dropna(subset=['위험도'], inplace=True) # 이 부분은 남겨둡니다. 혹시 모를 다른 NaN 제거용.
-        df_processed['위험도'] = df_processed['위험도'].astype(int)
-
-        risk_map = {0: '저위험', 1: '중위험', 2: '고위험'}
-        df_processed['위험도_라벨'] = df_processed['위험도'].map(risk_map)
-
-        df_processed.drop(columns=['C1_flag', 'C2_flag', 'C1_3yr_sum', 'C2_3yr_sum', 'C1_met', 'C2_met'], inplace=True, errors='ignore')
-    else:
-        st.warning("⚠️ '이자보상배율(이자비용)' 또는 '영업활동으로 인한 현금흐름(*)(천원)' 컬럼이 없어 '위험도'를 계산할 수 없습니다.")
-
-    return df_processed
\ No newline at end of file
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def get_backtest_store(dataset_version, _frame):
+    """
+    데이터셋 버전 ID를 키로 BacktestStore를 공유합니다.
+    아티팩트에 저장된 결과가 있으면 불러오기만 하고, 없을 때만 계산합니다.
+    DataFrame(_frame)은 해싱하지 않으므로 호출마다 전체 데이터를 해싱하는 비용이 없습니다.
+    같은 버전을 동시에 요청하면 st.cache_resource가 한 번만 계산하고 나머지는 그 결과를 기다립니다.
+    """
+    store = load_backtest_artifact(dataset_version, _frame)
+    if store is not None:
+        return store
+    return BacktestStore(_frame, dataset_version, BACKTEST_TOP_N)
+
+# --- 현재 데이터셋 레지스트리와 파일 감시 ---
+# TTL로 주기적으로 다시 계산하는 대신, 엑셀 파일이나 현재 아티팩트(CURRENT)가 바뀌었을 때만 백그라운드에서 새 버전으로 교체합니다.
+# 교체는 레지스트리의 참조 하나만 바꾸므로 원자적이며, 진행 중인 세션은 session_state에 고정된 이전 버전을 계속 사용합니다.
+
+DATASET_POLL_SECONDS = 5.0 # 엑셀/아티팩트 변경 확인 주기 (초)
+
+_CURRENT_STORES = {}  # {엑셀 경로: StockStore}
+_DATASET_WATCHERS = {}  # {엑셀 경로: DatasetWatcher}
+_DATASET_LOCK = threading.Lock()
+
+def _file_stat(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+def _watched_stat(path):
+    """감시 대상인 (엑셀 파일, 현재 아티팩트 포인터)의 크기/mtime."""
+    return (_file_stat(path), _file_stat(artifacts_dir_for(path) / CURRENT_POINTER_FILE))
+
+def get_stock_store(file_path=None):
+    """
+    모든 세션이 공유하는 현재 버전의 StockStore를 반환합니다. (처리할 데이터가 없으면 None)
+    처음 한 번만 열고(동시 호출은 하나로 합침), 이후에는 파일 감시 스레드가 새 버전으로 교체할 때까지 같은 객체를 돌려줍니다.
+    """
+    path = Path(file_path) if file_path else STOCK_DATASET_PATH
+    store = _CURRENT_STORES.get(str(path))
+    if store is None:
+        store = single_flight(("stock_store", str(path)), _load_current_store, path)
+    return store
+
+def get_stock_dataset(file_path=None, columns=None, years=None):
+    """현재 버전에서 columns/years 조건에 맞는 공유 StockDataset을 반환합니다. (조건이 없으면 전체)"""
+    store = get_stock_store(file_path)
+    if store is None:
+        return StockDataset(pd.DataFrame())
+    return store.query(columns, years)
+
+def get_session_dataset(columns=None, years=None):
+    """
+    이 세션이 사용하는 데이터셋입니다. 각 페이지는 필요한 컬럼/연도만 선언해서 가져옵니다.
+    세션이 처음 데이터를 볼 때 현재 버전에 고정되며, 중간에 새 버전이 올라와도 설문을 다시 시작할 때(reset_survey_state)까지 그대로 유지됩니다.
+    """
+    store = st.session_state.get('stock_store')
+    if store is None:
+        with st.spinner("데이터를 불러오는 중입니다..."):
+            store = get_stock_store()
+        if store is None:
+            return StockDataset(pd.DataFrame())
+        st.session_state.stock_store = store
+    return store.query(columns, years)
+
+def _load_current_store(path):
+    key = str(path)
+    if key in _CURRENT_STORES:
+        return _CURRENT_STORES[key]
+    workbook_stat = _file_stat(path)
+    store = _load_stock_store(path)
+    if store is not None:
+        with _DATASET_LOCK:
+            _CURRENT_STORES[key] = store
+        _start_dataset_watcher(path, (workbook_stat, _watched_stat(path)[1]))
+    return store
+
+def _start_dataset_watcher(path, stat):
+    with _DATASET_LOCK:
+        if str(path) in _DATASET_WATCHERS:
+            return
+        watcher = _DATASET_WATCHERS[str(path)] = DatasetWatcher(path, stat)
+    watcher.start()
+
+class DatasetWatcher(threading.Thread):
+    """
+    엑셀 파일과 현재 아티팩트 포인터(CURRENT)의 크기/mtime을 주기적으로 확인하다가, 변경이 끝나면(두 번 연속 같은 값) 새 버전으로 교체합니다.
+    (포인터도 감시하므로 `python data_pipeline.py build/ingest`로 다른 프로세스가 만든 새 버전도 반영됩니다.)
+    내용 해시가 같아 버전이 그대로이면 교체하지 않습니다. 새 데이터 처리에 실패하면 기존 버전을 계속 사용합니다.
+    """
+
+    def __init__(self, path, stat, interval=None):
+        super().__init__(name=f"stock-dataset-watcher:{Path(path).name}", daemon=True)
+        self.path = Path(path)
+        self.interval = interval or DATASET_POLL_SECONDS
+        self._loaded_stat = stat
+
+    def run(self):
+        pending = None
+        while True:
+            time.sleep(self.interval)
+            stat = _watched_stat(self.path)
+            if stat == self._loaded_stat:
+                pending = None
+                continue
+            if stat != pending:
+                # 파일을 복사하는 중일 수 있으므로 다음 확인 때까지 값이 그대로인지 기다립니다.
+                pending = stat
+                continue
+            pending = None
+            self._reload(stat)
+
+    def _reload(self, stat):
+        current = _CURRENT_STORES.get(str(self.path))
+        try:
+            store = _load_stock_store(self.path)
+        except BaseException:  # st.stop() 등으로 감시 스레드가 끝나지 않도록
+            logger.exception("새 데이터셋 처리 실패: %s (기존 버전 유지)", self.path)
+            return
+        # 로드 중에 아티팩트를 새로 만들었을 수 있으므로, 다음 비교에는 로드 후의 포인터 상태를 사용
+        self._loaded_stat = (stat[0], _watched_stat(self.path)[1])
+        if store is None:
+            logger.warning("새 데이터셋에 처리할 종목이 없어 기존 버전을 유지합니다: %s", self.path)
+            return
+        if current is not None and store.version == current.version:
+            return
+
+        # 새 버전의 백테스팅 결과까지 불러온 뒤에 교체하여, 새 세션이 기다리지 않게 합니다.
+        backtest_data = store.query(BACKTEST_COLUMNS)
+        get_backtest_store(backtest_data.version, backtest_data.frame)
+        _publish_store(self.path, store)
+
+def _publish_store(path, store):
+    """레지스트리의 현재 데이터셋 버전을 교체합니다. 이후 새 세션과 백그라운드 예열은 새 버전을 사용합니다."""
+    with _DATASET_LOCK:
+        previous = _CURRENT_STORES.get(str(path))
+        _CURRENT_STORES[str(path)] = store
+    with _BACKGROUND_LOCK:
+        # 현재 버전을 예열하는 작업은 새 버전으로 다시 시작하고, 끝난 버전별 작업은 결과를 캐시에 맡기고 놓아줍니다.
+        stale = [key for key, future in _BACKGROUND_JOBS.items() if key[0] == "backtest_store" and (key[1] is None or future.done())]
+        for key in stale:
+            del _BACKGROUND_JOBS[key]
+    logger.info("데이터셋 교체: %s -> %s", previous.version if previous else None, store.version)
+
+
+# --- 백그라운드 작업 ---
+# 백테스팅처럼 오래 걸리는 계산을 세션의 스크립트 스레드 밖에서 미리 실행합니다.
+# (화면 연출 중에 서버 스레드가 time.sleep으로 묶여 있지 않도록)
+
+_BACKGROUND_EXECUTOR = ThreadPoolExecutor(max_workers=2, thread_name_prefix="stock-background")
+_BACKGROUND_JOBS = {}
+_BACKGROUND_LOCK = threading.Lock()
+
+def submit_background(key, func, *args):
+    """
+    func(*args)를 백그라운드 스레드에서 실행하고 Future를 반환합니다.
+    같은 key의 작업이 실행 중이거나 이미 성공했으면 새로 제출하지 않고 그 Future를 돌려줍니다. (실패한 작업만 재시도)
+    """
+    with _BACKGROUND_LOCK:
+        future = _BACKGROUND_JOBS.get(key)
+        if future is None or (future.done() and future.exception() is not None):
+            future = _BACKGROUND_EXECUTOR.submit(func, *args)
+            _BACKGROUND_JOBS[key] = future
+        return future
+
+def _warm_backtest_store(dataset=None):
+    if dataset is None:
+        dataset = get_stock_dataset(columns=BACKTEST_COLUMNS)
+    return get_backtest_store(dataset.version, dataset.frame)
+
+def start_backtest_warmup(dataset=None):
+    """
+    백테스팅 저장소를 백그라운드에서 준비하고, 결과가 BacktestStore인 Future를 반환합니다. (이미 준비되어 있으면 즉시 완료)
+    dataset(세션에 고정된 StockDataset)을 주면 그 버전을, 없으면 공유 데이터셋의 현재 버전을 준비합니다.
+    설문 결과가 정해지는 시점에 호출해 두면, 대시보드에 도착했을 때 결과가 이미 캐시에 있습니다.
+    """
+    if dataset is None:
+        return submit_background(("backtest_store", None), _warm_backtest_store)
+    return submit_background(("backtest_store", dataset.version), _warm_backtest_store, dataset)